@@ -0,0 +1,147 @@
+"""
+Resource budgets for the SAT solvers.
+
+A solve that runs out of its budget stops and reports "UNKNOWN" instead
+of SAT or UNSAT. A3/budget.py (for the DPLL solver) and CODE/budget.py
+(for the CDCL solver) are identical copies, change both together.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows, memory limits are not checked there
+    resource = None
+
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # no sysconf on Windows
+    PAGE_SIZE = 4096
+
+
+def memory_mb() -> float:
+    """
+    Current resident memory of this process in MB, read from
+    /proc/self/statm. Where that does not exist (macOS, Windows) only the
+    peak is known, see peak_memory_mb.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_memory_mb()
+    return resident * PAGE_SIZE / (1024 * 1024)
+
+
+def peak_memory_mb() -> float:
+    """
+    Peak resident memory of this process in MB, or 0 if it cannot be read.
+    It never goes down, so after one large solve it stays high.
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+@dataclass
+class Budget:
+    """
+    Limits for a single solve, None meaning unlimited.
+
+    - max_time: wall-clock seconds since the solve started
+    - max_decisions, max_conflicts, max_propagations: solver counters
+    - max_memory_mb: current resident memory of the process (see
+      memory_mb), memory that an earlier solve released does not count
+    - cancel() may be called from any thread, also before the solve
+      started; it stays in effect, so every later solve with this budget
+      stops at once too, until reset() is called
+
+    After a solve ran out, reason names the limit that was hit.
+    """
+    max_time: Optional[float] = None
+    max_decisions: Optional[int] = None
+    max_conflicts: Optional[int] = None
+    max_propagations: Optional[int] = None
+    max_memory_mb: Optional[float] = None
+
+    # Reading the process memory is a system call, so only do it every so many checks
+    memory_check_interval: int = 1000
+
+    reason: Optional[str] = field(default=None, init=False)
+    _cancelled: threading.Event = field(default_factory=threading.Event, init=False, repr=False)
+    _started: float = field(default=0.0, init=False, repr=False)
+    _checks: int = field(default=0, init=False, repr=False)
+    _running: bool = field(default=False, init=False, repr=False)
+
+    def start(self) -> None:
+        """
+        Called by the solver as early as possible when a solve starts, so
+        the time limit includes preprocessing and setup. While a solve is
+        running (until finish), further calls keep the clock going.
+        """
+        if self._running:
+            return
+        self._running = True
+        self.reason = None
+        self._started = time.perf_counter()
+        self._checks = 0
+
+    def finish(self) -> None:
+        """
+        Called by the solver when a solve returns, the next start begins a
+        new one.
+        """
+        self._running = False
+
+    def cancel(self) -> None:
+        """
+        Ask the solve to stop, safe to call from any thread. It stays
+        cancelled until reset.
+        """
+        self._cancelled.set()
+
+    def reset(self) -> None:
+        """
+        Undo cancel (and forget the reason), for a caller that reuses the
+        budget after cancelling it.
+        """
+        self._cancelled.clear()
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def exhausted(self, decisions: int = 0, conflicts: int = 0, propagations: int = 0) -> bool:
+        """
+        Check the limits against the solver's counters, and set reason if
+        one of them was hit.
+        """
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self.max_decisions is not None and decisions >= self.max_decisions:
+            self.reason = "decisions"
+        elif self.max_conflicts is not None and conflicts >= self.max_conflicts:
+            self.reason = "conflicts"
+        elif self.max_propagations is not None and propagations >= self.max_propagations:
+            self.reason = "propagations"
+        elif self.max_time is not None and self.elapsed() >= self.max_time:
+            self.reason = "time"
+        elif self.max_memory_mb is not None:
+            if self._checks % self.memory_check_interval == 0 and memory_mb() >= self.max_memory_mb:
+                self.reason = "memory"
+            self._checks += 1
+        return self.reason is not None
@@ -1,8 +1,13 @@
 from __future__ import annotations
 from typing import List, Tuple, Optional, Set
+from functools import lru_cache
 import random
 import math
 
+from encoder import (exactly_one_v_per_cel, row_constraint, column_constraint,
+                     box_constraint, orthogonal_constraint)
+from solver import DPLLSolver
+
 N_DEFAULT = 9
 
 ####################
@@ -97,8 +102,9 @@ def varnumber(row: int, column: int, value: int, N: int = N_DEFAULT) -> int:
 def get_rcv(unit: int, N: int = N_DEFAULT) -> Optional[Tuple[int, int, int]]:
     """
     Get real values back out of varnumber encoding. Inverse of varnumber.
+    Auxiliary variables (above N^3, see encoder.VariablePool) give None.
     """
-    if unit <= 0:
+    if unit <= 0 or unit > N * N * N:
         return None
 
     u = unit - 1  
@@ -178,9 +184,49 @@ def move_those_values(ready2move: List[List[int]], k: int, N: int = N_DEFAULT) -
     return moved_list
 
 
-def generate_random_sudoku_puzzle(filled_percentage: float) -> List[List[int]]:
+@lru_cache(maxsize=1)
+def clue_solver() -> DPLLSolver:
+    """
+    Incremental solver over the 9 by 9 non-consecutive sudoku rules without
+    clues, built once and shared by every call of drop_conflicting_clues.
+    """
+    N = N_DEFAULT
+    rules = (exactly_one_v_per_cel(N) + row_constraint(N) + column_constraint(N)
+             + box_constraint(N) + orthogonal_constraint(N))
+    return DPLLSolver(rules, N * N * N, heuristic="cell")
+
+
+def drop_conflicting_clues(grid: List[List[int]]) -> List[Tuple[int, int, int]]:
+    """
+    Remove clues from grid (in place) until it has a solution, returns the
+    removed clues as (row, column, value).
+
+    The clues are solved as assumptions. While the grid is unsolvable the
+    solver reports a core of clues that cannot all hold together, and one
+    clue of that core is removed, so clues that take no part in the
+    conflict are kept. If the solver gives up (UNKNOWN) there is no core
+    and any clue may be removed.
+    """
+    solver = clue_solver()
+    removed: List[Tuple[int, int, int]] = []
+    while True:
+        clues = [varnumber(r, c, grid[r][c]) for r in range(9) for c in range(9) if grid[r][c]]
+        status, _ = solver.solve(clues)
+        if status == "SAT":
+            return removed
+        r, c, v = get_rcv(random.choice(solver.core or clues))
+        grid[r][c] = 0
+        removed.append((r, c, v))
+
+
+def generate_random_sudoku_puzzle(filled_percentage: float, solvable: bool = False) -> List[List[int]]:
     """
     Make sudoku of 9 by 9 that takes sudoku rules into account
+
+    - every clue is valid given the clues before it, but the grid as a
+      whole may have no solution
+    - with solvable, the clues that make it unsolvable are dropped again
+      (see drop_conflicting_clues)
     """
     filled_percentage = max(0.0, min(1.0, filled_percentage))
     grid = [[0] * 9 for _ in range(9)]
@@ -204,6 +250,8 @@ def generate_random_sudoku_puzzle(filled_percentage: float) -> List[List[int]]:
                 filled += 1
                 # Go to next cell
                 break  
+    if solvable:
+        drop_conflicting_clues(grid)
     return grid
 
 
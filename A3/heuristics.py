@@ -0,0 +1,713 @@
+"""
+Branching heuristics for the DPLL solver.
+
+The scores are kept up to date from the solver's assign/undo hooks, so
+choosing a branching literal does not recount the whole formula.
+
+Heuristics are registered by name in HEURISTICS and created with
+make_heuristic(name, solver).
+"""
+
+from typing import Callable, Dict, List, Optional
+from bisect import bisect_left
+import heapq
+
+
+class BucketQueue:
+    """
+    Max-priority queue over literals with small non-negative integer scores.
+
+    - score is a list indexed by literal, owned and updated by the caller
+    - a score may drop without telling the queue, the entry is moved down
+      to the right bucket once max() runs into it
+    - a literal has to be pushed again when its score goes up
+    - ties are broken by the lowest rank(key), by default the position of
+      the key in keys. Like the score, a rank may go up without telling
+      the queue, but the key has to be pushed again when its rank goes down
+    """
+
+    def __init__(self, keys: List[int], score: List[int], max_score: int = 0,
+                 rank: Optional[Callable[[int], int]] = None):
+        self.keys = keys
+        self.score = score
+        self.position: List[int] = [0] * len(score)
+        for i, key in enumerate(keys):
+            self.position[key] = i
+        self.rank = rank if rank is not None else self.position.__getitem__
+        self.present: List[bool] = [False] * len(score)
+
+        # One heap per score of entries rank * len(keys) + position, stale
+        # entries are skipped lazily
+        self.buckets: List[List[int]] = [[] for _ in range(max(max(score), max_score) + 1)]
+        self.top = 0
+        self.pushes = 0
+
+    def push(self, key: int) -> None:
+        self.present[key] = True
+        score = self.score[key]
+        heapq.heappush(self.buckets[score], self.rank(key) * len(self.keys) + self.position[key])
+        if score > self.top:
+            self.top = score
+
+        # Throw away the stale entries once they outnumber the keys
+        self.pushes += 1
+        if self.pushes > 4 * len(self.keys):
+            self.rebuild()
+
+    def discard(self, key: int) -> None:
+        self.present[key] = False
+
+    def rebuild(self) -> None:
+        for bucket in self.buckets:
+            bucket.clear()
+        stride, rank = len(self.keys), self.rank
+        for i, key in enumerate(self.keys):
+            if self.present[key]:
+                self.buckets[self.score[key]].append(rank(key) * stride + i)
+        for bucket in self.buckets:
+            heapq.heapify(bucket)
+        self.pushes = 0
+
+    def max(self) -> int:
+        """
+        Present key with the highest score, or 0 if there is none.
+        """
+        buckets, keys, score, present, rank = self.buckets, self.keys, self.score, self.present, self.rank
+        stride = len(keys)
+        while True:
+            bucket = buckets[self.top]
+            while bucket:
+                entry = bucket[0]
+                key = keys[entry % stride]
+                if present[key]:
+                    current = rank(key) * stride + entry % stride
+                    if score[key] == self.top and current == entry:
+                        return key
+                    # Score dropped or rank went up since the entry was pushed,
+                    # an entry with a lower rank was pushed again already
+                    if score[key] < self.top or current > entry:
+                        heapq.heappush(buckets[score[key]], current)
+                heapq.heappop(bucket)
+            if self.top == 0:
+                return 0
+            self.top -= 1
+
+
+class ScoreHeap:
+    """
+    Max-heap over keys (literals or variables) with arbitrary scores.
+
+    - score(key) gives the current score of a key
+    - as in BucketQueue, a key only has to be pushed again when its score goes up
+    - keys that are assigned in value are skipped, and have to be pushed
+      again once they are unassigned
+    - ties are broken by the position of the key in keys
+    """
+
+    def __init__(self, keys: List[int], score: Callable[[int], float], value: List[int]):
+        self.keys = keys
+        self.score = score
+        self.value = value
+        self.position: Dict[int, int] = {key: i for i, key in enumerate(keys)}
+        self.heap: List[tuple] = []
+        self.pushes = 0
+        self.rebuild()
+
+    def push(self, key: int) -> None:
+        heapq.heappush(self.heap, (-self.score(key), self.position[key]))
+
+        # Throw away the stale entries once they outnumber the keys
+        self.pushes += 1
+        if self.pushes > 4 * len(self.keys):
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Fill the heap with every unassigned key that has a positive score.
+        """
+        value, score = self.value, self.score
+        self.heap = [(-score(key), i) for i, key in enumerate(self.keys)
+                     if value[key] == 0 and score(key) > 0]
+        heapq.heapify(self.heap)
+        self.pushes = 0
+
+    def max(self) -> int:
+        """
+        Unassigned key with the highest score, or 0 if there is none.
+        """
+        heap, keys, value = self.heap, self.keys, self.value
+        while heap:
+            negative, position = heap[0]
+            key = keys[position]
+            if value[key] == 0:
+                score = self.score(key)
+                if score == -negative:
+                    return key
+                # Score dropped since the entry was pushed
+                if score < -negative:
+                    heapq.heapreplace(heap, (-score, position))
+                    continue
+            heapq.heappop(heap)
+        return 0
+
+    def pop(self) -> None:
+        """
+        Drop the entry max() returned.
+        """
+        heapq.heappop(self.heap)
+
+
+def literal_order(clauses: List[List[int]], num_vars: int) -> List[int]:
+    """
+    All literals, in order of their first occurrence in the clauses.
+
+    Used to break ties between equal scores the same way as recounting the
+    clauses front to back would.
+    """
+    order = dict()
+    for clause in clauses:
+        for literal in clause:
+            order[literal] = None
+    for var in range(1, num_vars + 1):
+        order[var] = None
+        order[-var] = None
+    return list(order)
+
+
+def variable_order(clauses: List[List[int]], num_vars: int) -> List[int]:
+    """
+    All variables, in order of their first occurrence in the clauses.
+    """
+    return list(dict.fromkeys(abs(literal) for literal in literal_order(clauses, num_vars)))
+
+
+class Heuristic:
+    """
+    Interface of a branching heuristic.
+
+    The solver calls
+    - assigned(literal) after literal was made true
+    - unassigned(literal) after literal was taken off the trail
+    - conflict(i) when clause i has no true or unassigned literal left
+    - pick() for the literal to branch on, 0 meaning every clause is satisfied
+
+    The solver's clause counters (satisfied, free) are already updated when
+    assigned and unassigned are called.
+    """
+
+    def __init__(self, solver):
+        self.clauses = solver.clauses
+        # Clause i is lits[offsets[i]:offsets[i + 1]], read directly in the
+        # per-assignment updates instead of going through clauses[i]
+        self.lits = solver.clauses.lits
+        self.offsets = solver.clauses.offsets
+        self.occurrences = solver.occurrences
+        self.satisfied = solver.satisfied
+        self.free = solver.free
+        self.value = solver.value
+        self.num_vars = solver.num_vars
+
+    def assigned(self, literal: int) -> None:
+        pass
+
+    def unassigned(self, literal: int) -> None:
+        pass
+
+    def conflict(self, clause_index: int) -> None:
+        pass
+
+    def pick(self) -> int:
+        raise NotImplementedError
+
+
+class DLIS(Heuristic):
+    """
+    Dynamic Largest Individual Sum: branch on the unassigned literal that
+    occurs in the most unsatisfied clauses.
+
+    - count[literal] is the number of unsatisfied clauses containing literal
+    - counts only change when a clause becomes satisfied or unsatisfied
+    - unassigned literals are kept in a bucket queue keyed on their count
+    - ties go to the literal that occurs first in the unsatisfied clauses
+      (see first_open), as when the open clauses are recounted front to
+      back, so the DPLL calls match the recounting solver
+    """
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        num_vars = self.num_vars
+        self.count: List[int] = [len(occ) for occ in self.occurrences]
+        # Every clause in occurrences[literal] before head[literal] is
+        # satisfied, the occurrence lists are in clause order
+        self.head: List[int] = [0] * len(self.occurrences)
+        self.queue = BucketQueue(literal_order(self.clauses, num_vars), self.count,
+                                 rank=self.first_open)
+        for var in range(1, num_vars + 1):
+            self.queue.push(var)
+            self.queue.push(-var)
+
+    def first_open(self, literal: int) -> int:
+        """
+        Position in the clause literals of the first occurrence of literal
+        in an unsatisfied clause, past the last literal if there is none.
+        """
+        occurrences, satisfied, lits, offsets = self.occurrences[literal], self.satisfied, self.lits, self.offsets
+        h = self.head[literal]
+        while h < len(occurrences) and satisfied[occurrences[h]]:
+            h += 1
+        self.head[literal] = h
+        if h == len(occurrences):
+            return len(lits)
+        k = offsets[occurrences[h]]
+        while lits[k] != literal:
+            k += 1
+        return k
+
+    def assigned(self, literal: int) -> None:
+        """
+        Called after literal was made true.
+        """
+        self.queue.discard(literal)
+        self.queue.discard(-literal)
+
+        # Clauses that just became satisfied no longer count for their
+        # literals, their first_open only goes up so the queue finds out lazily
+        count, satisfied, lits, offsets = self.count, self.satisfied, self.lits, self.offsets
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 1:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] -= 1
+
+    def unassigned(self, literal: int) -> None:
+        """
+        Called after literal was taken off the trail.
+        """
+        # Clauses that are open again count for their literals again, and
+        # may be their first open occurrence again
+        count, satisfied, lits, offsets = self.count, self.satisfied, self.lits, self.offsets
+        occurrences, head = self.occurrences, self.head
+        present, push = self.queue.present, self.queue.push
+        for i in occurrences[literal]:
+            if satisfied[i] == 0:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] += 1
+                    h = bisect_left(occurrences[other], i)
+                    if h < head[other]:
+                        head[other] = h
+                    if present[other]:
+                        push(other)
+
+        push(literal)
+        push(-literal)
+
+    def pick(self) -> int:
+        """
+        Literal to branch on, or 0 if no unassigned literal is in an open clause.
+        """
+        literal = self.queue.max()
+        if literal == 0 or self.count[literal] == 0:
+            return 0
+        return literal
+
+
+class DLCS(Heuristic):
+    """
+    Dynamic Largest Combined Sum: branch on the variable that occurs in the
+    most unsatisfied clauses (both polarities together), with the polarity
+    that occurs most.
+
+    - count[literal] as in DLIS, combined[var] = count[var] + count[-var]
+    - unassigned variables are kept in a bucket queue keyed on combined
+    """
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        num_vars = self.num_vars
+        self.count: List[int] = [len(occ) for occ in self.occurrences]
+        self.combined: List[int] = [self.count[var] + self.count[-var]
+                                    for var in range(num_vars + 1)]
+        self.queue = BucketQueue(variable_order(self.clauses, num_vars), self.combined)
+        for var in range(1, num_vars + 1):
+            self.queue.push(var)
+
+    def assigned(self, literal: int) -> None:
+        self.queue.discard(abs(literal))
+
+        count, combined, satisfied, lits, offsets = (
+            self.count, self.combined, self.satisfied, self.lits, self.offsets)
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 1:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] -= 1
+                    combined[abs(other)] -= 1
+
+    def unassigned(self, literal: int) -> None:
+        count, combined, satisfied, lits, offsets = (
+            self.count, self.combined, self.satisfied, self.lits, self.offsets)
+        present, push = self.queue.present, self.queue.push
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 0:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] += 1
+                    var = abs(other)
+                    combined[var] += 1
+                    if present[var]:
+                        push(var)
+
+        push(abs(literal))
+
+    def pick(self) -> int:
+        var = self.queue.max()
+        if var == 0 or self.combined[var] == 0:
+            return 0
+        return var if self.count[var] >= self.count[-var] else -var
+
+
+class MOMS(Heuristic):
+    """
+    Maximum Occurrences in clauses of Minimum Size.
+
+    - f[s][literal] is the number of unsatisfied clauses with s unassigned
+      literals that contain literal
+    - among the smallest open clauses, branch on the variable with the highest
+      (f(v) + f(-v)) * 2^k + f(v) * f(-v), with the polarity that occurs most
+    - one heap of variables per clause size
+    """
+
+    k = 10
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        num_vars = self.num_vars
+        longest = max(self.free, default=0)
+        self.f: List[List[int]] = [[0] * (2 * num_vars + 1) for _ in range(longest + 1)]
+        # open_of_size[s] is the number of unsatisfied clauses with s unassigned literals
+        self.open_of_size: List[int] = [0] * (longest + 1)
+        for clause in self.clauses:
+            self.open_of_size[len(clause)] += 1
+            for literal in clause:
+                self.f[len(clause)][literal] += 1
+
+        order = variable_order(self.clauses, num_vars)
+        self.heaps = [ScoreHeap(order, self.score_function(size), self.value)
+                      for size in range(longest + 1)]
+
+    def score_function(self, size: int) -> Callable[[int], int]:
+        f = self.f[size]
+        k = self.k
+        return lambda var: ((f[var] + f[-var]) << k) + f[var] * f[-var]
+
+    def move(self, clause_index: int, old: int, new: int) -> None:
+        """
+        Move an open clause from size old to size new (-1 meaning not open).
+        """
+        f, value = self.f, self.value
+        clause = self.lits[self.offsets[clause_index]:self.offsets[clause_index + 1]]
+        if old >= 0:
+            self.open_of_size[old] -= 1
+            f_old = f[old]
+            for literal in clause:
+                f_old[literal] -= 1
+        if new >= 0:
+            self.open_of_size[new] += 1
+            f_new, push = f[new], self.heaps[new].push
+            for literal in clause:
+                f_new[literal] += 1
+                if value[literal] == 0:
+                    push(abs(literal))
+
+    def assigned(self, literal: int) -> None:
+        satisfied, free = self.satisfied, self.free
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 1:
+                self.move(i, free[i] + 1, -1)
+        for i in self.occurrences[-literal]:
+            if not satisfied[i]:
+                self.move(i, free[i] + 1, free[i])
+
+    def unassigned(self, literal: int) -> None:
+        satisfied, free = self.satisfied, self.free
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 0:
+                self.move(i, -1, free[i])
+        for i in self.occurrences[-literal]:
+            if not satisfied[i]:
+                self.move(i, free[i] - 1, free[i])
+
+        # The variable dropped out of every heap while it was assigned
+        var = abs(literal)
+        for size, f in enumerate(self.f):
+            if f[var] or f[-var]:
+                self.heaps[size].push(var)
+
+    def pick(self) -> int:
+        for size in range(1, len(self.open_of_size)):
+            if self.open_of_size[size]:
+                var = self.heaps[size].max()
+                if var == 0:
+                    return 0
+                f = self.f[size]
+                return var if f[var] >= f[-var] else -var
+        return 0
+
+
+class JeroslowWang(Heuristic):
+    """
+    Jeroslow-Wang: J(literal) is the sum of 2^-|C| over the unsatisfied
+    clauses C containing literal, |C| the number of unassigned literals.
+
+    - one-sided: branch on the literal with the highest J
+    - two-sided: branch on the variable with the highest J(v) + J(-v), with
+      the polarity that has the higher J
+    - weights are kept as integers 2^(L - |C|), L the longest clause, so
+      undoing an assignment restores the scores exactly
+    """
+
+    two_sided = False
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        num_vars = self.num_vars
+        longest = max(self.free, default=0)
+        self.weight: List[int] = [1 << (longest - size) for size in range(longest + 1)]
+        self.J: List[int] = [0] * (2 * num_vars + 1)
+        for clause in self.clauses:
+            for literal in clause:
+                self.J[literal] += self.weight[len(clause)]
+
+        J = self.J
+        if self.two_sided:
+            self.key = abs
+            self.heap = ScoreHeap(variable_order(self.clauses, num_vars),
+                                  lambda var: J[var] + J[-var], self.value)
+        else:
+            self.key = lambda literal: literal
+            self.heap = ScoreHeap(literal_order(self.clauses, num_vars),
+                                  J.__getitem__, self.value)
+
+    def assigned(self, literal: int) -> None:
+        J, weight, satisfied, free, lits, offsets, value = (
+            self.J, self.weight, self.satisfied, self.free, self.lits, self.offsets, self.value)
+        key, push = self.key, self.heap.push
+
+        # Clauses that just became satisfied no longer count
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 1:
+                w = weight[free[i] + 1]
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    J[other] -= w
+        # Open clauses that lost a literal now weigh twice as much
+        for i in self.occurrences[-literal]:
+            if not satisfied[i]:
+                w = weight[free[i] + 1]
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    J[other] += w
+                    if value[other] == 0:
+                        push(key(other))
+
+    def unassigned(self, literal: int) -> None:
+        J, weight, satisfied, free, lits, offsets, value = (
+            self.J, self.weight, self.satisfied, self.free, self.lits, self.offsets, self.value)
+        key, push = self.key, self.heap.push
+
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 0:
+                w = weight[free[i]]
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    J[other] += w
+                    if value[other] == 0:
+                        push(key(other))
+        for i in self.occurrences[-literal]:
+            if not satisfied[i]:
+                w = weight[free[i]]
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    J[other] -= w
+
+        push(key(literal))
+        push(key(-literal))
+
+    def pick(self) -> int:
+        key = self.heap.max()
+        if key == 0:
+            return 0
+        if self.two_sided:
+            return key if self.J[key] >= self.J[-key] else -key
+        return key
+
+
+class TwoSidedJeroslowWang(JeroslowWang):
+    two_sided = True
+
+
+class VSIDS(Heuristic):
+    """
+    Variable activity in the style of VSIDS.
+
+    DPLL does not learn clauses, so the variables of every clause that ends
+    up empty during propagation are bumped instead.
+
+    - activity starts at the number of occurrences of the variable
+    - bumps grow by 1/decay after every conflict, which decays all older bumps
+    - the polarity is the literal that occurs in the most unsatisfied clauses
+    """
+
+    decay = 0.95
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        num_vars = self.num_vars
+        self.count: List[int] = [len(occ) for occ in self.occurrences]
+        self.activity: List[float] = [float(self.count[var] + self.count[-var])
+                                      for var in range(num_vars + 1)]
+        self.increment = 1.0
+        self.heap = ScoreHeap(variable_order(self.clauses, num_vars),
+                              self.activity.__getitem__, self.value)
+
+    def assigned(self, literal: int) -> None:
+        count, satisfied, lits, offsets = self.count, self.satisfied, self.lits, self.offsets
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 1:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] -= 1
+
+    def unassigned(self, literal: int) -> None:
+        count, satisfied, lits, offsets, value = (
+            self.count, self.satisfied, self.lits, self.offsets, self.value)
+        push = self.heap.push
+        for i in self.occurrences[literal]:
+            if satisfied[i] == 0:
+                for other in lits[offsets[i]:offsets[i + 1]]:
+                    count[other] += 1
+                    # Back in an open clause, so it may have been dropped from the heap
+                    if value[other] == 0 and count[other] + count[-other] == 1:
+                        push(abs(other))
+
+        push(abs(literal))
+
+    def conflict(self, clause_index: int) -> None:
+        activity = self.activity
+        for literal in self.clauses[clause_index]:
+            activity[abs(literal)] += self.increment
+        self.increment /= self.decay
+
+        # Rescale before the activities overflow
+        if self.increment > 1e100:
+            for var in range(len(activity)):
+                activity[var] *= 1e-100
+            self.increment *= 1e-100
+            self.heap.rebuild()
+
+    def pick(self) -> int:
+        count = self.count
+        while True:
+            var = self.heap.max()
+            if var == 0:
+                return 0
+            if count[var] or count[-var]:
+                return var if count[var] >= count[-var] else -var
+            # Only in satisfied clauses, pushed again once one reopens
+            self.heap.pop()
+
+
+class FewestCandidates(Heuristic):
+    """
+    Sudoku-aware: branch on a value of the open cell with the fewest
+    candidate values left.
+
+    - variables follow var(r,c,v) = r*N*N + c*N + v, with N the largest N
+      for which N^3 <= num_vars, or if smaller, the size of the longest
+      clause 1 2 .. N (the values of cell (0, 0)), since auxiliary variables
+      above N^3 also count in num_vars
+    - a cell is open while none of its values is true, its candidates are
+      the values that are not assigned false
+    - open cells are kept in a bucket queue keyed on N - candidates
+    - variables above N^3 are only branched on once every cell is filled
+    """
+
+    def __init__(self, solver):
+        super().__init__(solver)
+
+        N = 1
+        while (N + 1) ** 3 <= self.num_vars:
+            N += 1
+        if N ** 3 != self.num_vars:
+            lits, offsets = self.lits, self.offsets
+            cell_sizes = [offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)
+                          if lits[offsets[i]] == 1 and lits[offsets[i + 1] - 1] == offsets[i + 1] - offsets[i]
+                          and lits[offsets[i]:offsets[i + 1]].tolist() == list(range(1, offsets[i + 1] - offsets[i] + 1))]
+            if cell_sizes and 1 < max(cell_sizes) < N:
+                N = max(cell_sizes)
+        self.N = N
+
+        # Cells are numbered 1..N*N, 0 is not a cell
+        self.filled: List[int] = [0] * (N * N + 1)
+        self.eliminated: List[int] = [0] * (N * N + 1)
+        self.queue = BucketQueue(list(range(1, N * N + 1)), self.eliminated, N)
+        for cell in range(1, N * N + 1):
+            self.queue.push(cell)
+
+    def assigned(self, literal: int) -> None:
+        var = abs(literal)
+        if var > self.N ** 3:
+            return
+        cell = (var - 1) // self.N + 1
+        if literal > 0:
+            self.filled[cell] += 1
+            self.queue.discard(cell)
+        else:
+            self.eliminated[cell] += 1
+            if not self.filled[cell]:
+                self.queue.push(cell)
+
+    def unassigned(self, literal: int) -> None:
+        var = abs(literal)
+        if var > self.N ** 3:
+            return
+        cell = (var - 1) // self.N + 1
+        if literal > 0:
+            self.filled[cell] -= 1
+            if not self.filled[cell]:
+                self.queue.push(cell)
+        else:
+            self.eliminated[cell] -= 1
+
+    def pick(self) -> int:
+        cell = self.queue.max()
+        if cell:
+            first = (cell - 1) * self.N + 1
+            for var in range(first, first + self.N):
+                if self.value[var] == 0:
+                    return var
+
+        # Every cell is filled, branch on whatever open clause is left
+        for i, clause in enumerate(self.clauses):
+            if not self.satisfied[i]:
+                for literal in clause:
+                    if self.value[literal] == 0:
+                        return literal
+        return 0
+
+
+HEURISTICS: Dict[str, type] = {
+    "dlis": DLIS,
+    "dlcs": DLCS,
+    "moms": MOMS,
+    "jw": JeroslowWang,
+    "jw2": TwoSidedJeroslowWang,
+    "vsids": VSIDS,
+    "cell": FewestCandidates,
+}
+
+
+def make_heuristic(name: str, solver) -> Heuristic:
+    """
+    Create the heuristic registered under name for solver.
+    """
+    if name not in HEURISTICS:
+        raise ValueError(f"Unknown heuristic {name!r}, expected one of {sorted(HEURISTICS)}")
+    return HEURISTICS[name](solver)
@@ -1,12 +1,21 @@
 import os
 from typing import List
 from encoder import to_cnf  
+from clause_arena import ClauseArena
 from generator import generate_twodoku_puzzles_from_scratch
 
 Grid = List[List[int]]
 
 def write_dimacs(target, num_vars: int, clauses) -> None:
-    """Write DIMACS CNF to a file path or file-like (stdout)."""
+    """
+    Write DIMACS CNF to a file path or file-like (stdout), in one pass.
+
+    - clauses may also be a generator (see encoder.stream_cnf), which is
+      written while it is consumed. Its count is unknown until the end, so
+      the header gets room for it in trailing spaces and is filled in
+      afterwards; a target that cannot seek gets the clauses collected in
+      a ClauseArena first
+    """
     close = False
     if isinstance(target, str):
         f = open(target, "w")
@@ -14,10 +23,24 @@ def write_dimacs(target, num_vars: int, clauses) -> None:
     else:
         f = target
     try:
-        clauses = list(clauses)
-        f.write(f"p cnf {num_vars} {len(clauses)}\n")
-        for cl in clauses:
-            f.write(" ".join(str(l) for l in cl) + " 0\n")
+        if not hasattr(clauses, "__len__") and not f.seekable():
+            clauses = ClauseArena(clauses)
+        if hasattr(clauses, "__len__"):
+            f.write(f"p cnf {num_vars} {len(clauses)}\n")
+            for cl in clauses:
+                f.write(" ".join(map(str, cl)) + " 0\n")
+        else:
+            header_at = f.tell()
+            header = f"p cnf {num_vars} "
+            f.write(header + " " * 20 + "\n")
+            count = 0
+            for cl in clauses:
+                f.write(" ".join(map(str, cl)) + " 0\n")
+                count += 1
+            end = f.tell()
+            f.seek(header_at)
+            f.write(header + str(count))
+            f.seek(end)
     finally:
         if close:
             f.close()
@@ -1,47 +1,162 @@
 import os
 import csv
 import time
-import solver
-from solver import solve_cnf
+import argparse
+from dataclasses import fields
+from solver import solve_cnf, SolveStats, DPLLSolver
+from budget import Budget
+from tracing import NULL_TRACER, Tracer, StderrSink, JsonlSink
+from heuristics import HEURISTICS
 from main_a2 import parse_dimacs   # reuse the parser from main.py
 
+NUM_PAIRS = 20
 
-def solve_one_cnf(path: str):
-    """Read a DIMACS CNF, solve it, return statistics."""
+# Columns written for every solve, the SolveStats counters go after the
+# original ones so older CSVs keep their column positions
+RESULT_COLUMNS = ["status", "dpll_calls", "num_vars", "num_clauses", "time_sec"]
+RESULT_COLUMNS += [f.name for f in fields(SolveStats) if f.name not in RESULT_COLUMNS]
+
+
+class IncrementalBatch:
+    """
+    Solves a batch of CNFs that only differ in their unit clauses (the clues)
+    with one incremental DPLLSolver.
+
+    - the solver is built from the other clauses (the base encoding) and
+      only rebuilt when the base encoding or num_vars changes
+    - the unit clauses of every CNF are passed as assumptions
+    - unlike solve_cnf there is no pure literal preprocessing, since a
+      literal that is pure in the base encoding may be contradicted by a clue
+    """
+
+    def __init__(self, heuristic: str = "dlis", time_limit=None, tracer=NULL_TRACER):
+        self.heuristic = heuristic
+        self.time_limit = time_limit
+        self.tracer = tracer
+        self.solver = None
+        self.base = None
+        self.num_vars = 0
+
+    def solve(self, clauses, num_vars):
+        base = [c for c in clauses if len(c) != 1]
+        clues = [c[0] for c in clauses if len(c) == 1]
+        if self.solver is None or base != self.base or num_vars != self.num_vars:
+            self.solver = DPLLSolver(base, num_vars, self.heuristic,
+                                     budget=Budget(max_time=self.time_limit), tracer=self.tracer)
+            self.base, self.num_vars = base, num_vars
+        return self.solver.solve(clues)
+
+
+def solve_one_cnf(path: str, heuristic: str = "dlis", time_limit=None, tracer=NULL_TRACER,
+                  batch=None):
+    """Read a DIMACS CNF, solve it (with batch if given), return statistics."""
     clauses, num_vars = parse_dimacs(path)
     num_clauses = len(clauses)
 
     start = time.perf_counter()
-    status, _ = solve_cnf(clauses, num_vars)
+    if batch is not None:
+        result = batch.solve(clauses, num_vars)
+    else:
+        result = solve_cnf(clauses, num_vars, heuristic, budget=Budget(max_time=time_limit),
+                           tracer=tracer)
     elapsed = time.perf_counter() - start
 
     return {
-        "status": status,
+        "status": result.status,
         "num_vars": num_vars,
         "num_clauses": num_clauses,
-        "dpll_calls": solver.DPLL_CALLS,
         "time_sec": elapsed,
+        **result.stats.as_dict(),
     }
 
 
+def result_row(stats):
+    """Values of RESULT_COLUMNS, with times rounded to microseconds."""
+    return [f"{stats[c]:.6f}" if isinstance(stats[c], float) else stats[c]
+            for c in RESULT_COLUMNS]
+
+
+def sweep_heuristics(heuristics, time_limit=None, tracer=NULL_TRACER, incremental=False):
+    """
+    Solve every CNF of the 20_results/k_* corpora with each heuristic and
+    save DPLL calls and time per heuristic to 20_results/heuristic_results.csv.
+    With incremental, the CNFs of a corpus are solved as one IncrementalBatch.
+    """
+    results_dir = os.path.join(os.path.dirname(__file__), "20_results")
+    output_csv = os.path.join(results_dir, "heuristic_results.csv")
+    corpora = sorted(d for d in os.listdir(results_dir)
+                     if os.path.isdir(os.path.join(results_dir, d, "CNF encoding")))
+
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["corpus", "heuristic", "pair_index", "puzzle"] + RESULT_COLUMNS)
+
+        for corpus in corpora:
+            cnf_dir = os.path.join(results_dir, corpus, "CNF encoding")
+            for heuristic in heuristics:
+                batch = IncrementalBatch(heuristic, time_limit, tracer) if incremental else None
+                for i in range(1, NUM_PAIRS + 1):
+                    for puzzle in ("A", "B"):
+                        path = os.path.join(cnf_dir, f"DIMACS_{i}.grid_{puzzle}")
+                        if not os.path.exists(path):
+                            print(f"WARNING: {path} not found — skipping.")
+                            continue
+
+                        stats = solve_one_cnf(path, heuristic, time_limit, tracer, batch)
+                        writer.writerow([corpus, heuristic, i, puzzle] + result_row(stats))
+                f.flush()
+
+    print(f"Heuristic results saved to {output_csv}")
+
+
 def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--heuristic", default="dlis", choices=sorted(HEURISTICS))
+    p.add_argument("--sweep", action="store_true",
+                   help="run every heuristic over the 20_results corpora")
+    p.add_argument("--heuristics", nargs="+", default=list(HEURISTICS),
+                   choices=sorted(HEURISTICS), help="heuristics used by --sweep")
+    p.add_argument("--time-limit", type=float, default=None,
+                   help="seconds per solve, after which it is reported as UNKNOWN")
+    p.add_argument("--progress", type=float, default=None, metavar="SECONDS",
+                   help="print solver progress to stderr every SECONDS (and 1000 decisions)")
+    p.add_argument("--trace", default=None, metavar="FILE",
+                   help="append a JSONL trace of the solver progress to FILE")
+    p.add_argument("--incremental", action="store_true",
+                   help="load the shared base encoding once per batch and solve "
+                        "every puzzle with its clues as assumptions")
+    args = p.parse_args()
+
+    sinks = []
+    if args.progress is not None:
+        sinks.append(StderrSink())
+    if args.trace is not None:
+        sinks.append(JsonlSink(args.trace))
+    tracer = Tracer(sinks, every=1000, interval=args.progress) if sinks else NULL_TRACER
+
+    try:
+        if args.sweep:
+            sweep_heuristics(args.heuristics, args.time_limit, tracer, args.incremental)
+        else:
+            run_pairs(args.heuristic, args.time_limit, tracer, args.incremental)
+    finally:
+        tracer.close()
+
+
+def run_pairs(heuristic, time_limit=None, tracer=NULL_TRACER, incremental=False):
+    """
+    Solve the 20 A/B pairs in CNF encoding/ and save their statistics to
+    CNF encoding/experiment_results.csv. With incremental, the 40 CNFs are
+    solved as one IncrementalBatch.
+    """
+    batch = IncrementalBatch(heuristic, time_limit, tracer) if incremental else None
     base_dir = os.path.dirname(__file__)
     cnf_dir = os.path.join(base_dir, "CNF encoding")
     output_csv = os.path.join(cnf_dir, "experiment_results.csv")
 
-    NUM_PAIRS = 20
-
     with open(output_csv, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "pair_index",
-            "puzzle",
-            "status",
-            "dpll_calls",
-            "num_vars",
-            "num_clauses",
-            "time_sec",
-        ])
+        writer.writerow(["pair_index", "puzzle"] + RESULT_COLUMNS)
 
         for i in range(1, NUM_PAIRS + 1):
             path_A = os.path.join(cnf_dir, f"DIMACS_{i}.grid_A")
@@ -55,26 +170,12 @@ def main():
                 continue
 
             # Solve A
-            stats_A = solve_one_cnf(path_A)
-            writer.writerow([
-                i, "A",
-                stats_A["status"],
-                stats_A["dpll_calls"],
-                stats_A["num_vars"],
-                stats_A["num_clauses"],
-                f"{stats_A['time_sec']:.6f}",
-            ])
+            stats_A = solve_one_cnf(path_A, heuristic, time_limit, tracer, batch)
+            writer.writerow([i, "A"] + result_row(stats_A))
 
             # Solve B
-            stats_B = solve_one_cnf(path_B)
-            writer.writerow([
-                i, "B",
-                stats_B["status"],
-                stats_B["dpll_calls"],
-                stats_B["num_vars"],
-                stats_B["num_clauses"],
-                f"{stats_B['time_sec']:.6f}",
-            ])
+            stats_B = solve_one_cnf(path_B, heuristic, time_limit, tracer, batch)
+            writer.writerow([i, "B"] + result_row(stats_B))
 
     print(f"Experiment results saved to {output_csv}")
 
@@ -1,8 +1,70 @@
-from typing import List, Tuple, Optional, Iterable
+from typing import List, Tuple, Optional, Iterable, Iterator, Dict, Sequence, Set
 from collections import defaultdict, deque
-DPLL_CALLS = 0
+from dataclasses import dataclass, asdict
+import time
+from heuristics import make_heuristic
+from budget import Budget
+from tracing import NULL_TRACER
+from clause_arena import ClauseArena
 MAX_DPLL_CALLS = 100_000 
 
+
+@dataclass
+class SolveStats:
+    """
+    Statistics of a single solve.
+
+    - dpll_calls counts search nodes (the root and every branch)
+    - propagations counts literals assigned by unit propagation
+    - backtracks counts second branches tried after a conflict
+    - time_* are wall-clock seconds spent per phase
+    """
+    dpll_calls: int = 0
+    decisions: int = 0
+    propagations: int = 0
+    conflicts: int = 0
+    backtracks: int = 0
+    max_depth: int = 0
+    time_pure_literal: float = 0.0
+    time_propagation: float = 0.0
+    time_branching: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+class SolveResult(tuple):
+    """
+    The (status, model) pair returned by solve_cnf, with the statistics of
+    the solve attached as .stats.
+    """
+
+    def __new__(cls, status: str, model: List[int], stats: SolveStats):
+        result = super().__new__(cls, (status, model))
+        result.stats = stats
+        return result
+
+    @property
+    def status(self) -> str:
+        return self[0]
+
+    @property
+    def model(self) -> List[int]:
+        return self[1]
+
+
+def normalized(clauses: Iterable[Iterable[int]]) -> Iterator[List[int]]:
+    """
+    Yield the clauses without repeated literals (the solver counts each
+    literal of a clause once) and without tautologies (x and -x in one
+    clause, always satisfied).
+    """
+    for clause in clauses:
+        literals = dict.fromkeys(clause)
+        if not any(-literal in literals for literal in literals):
+            yield list(literals)
+
+
 def pure_literal(clauses: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
     """
     As a pre-processing step, find all pure literals and assign them true.
@@ -45,139 +107,445 @@ def pure_literal(clauses: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
     return clauses, assignment
 
 
-def simplify(clauses: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
-    """
-    Simplify clauses by using unit propagation.
+class DPLLSolver:
     """
-    implied: List[int] = []
-    implied_set = set()
-
-    # collect all initial unit clauses
-    unit_clauses = deque(literal for clause in clauses
-                        if len(clause) == 1
-                        for literal in clause)
+    DPLL search over one shared clause database.
 
-    while unit_clauses and clauses:
-        literal = unit_clauses.popleft()
+    Instead of building a new clause list for every unit and every branch,
+    assignments are pushed on a trail and undone again on backtrack. The
+    clauses are kept in a ClauseArena.
 
-        # Check for conflicts
-        if -literal in implied_set:
-            return ([[]], implied)
-        if literal in implied_set:
-            continue
-
-        implied_set.add(literal)
-        implied.append(literal)
-
-        new_clauses: List[List[int]] = []
+    The solver can be used incrementally: solve(assumptions) may be called
+    any number of times, with add_clause in between, reusing the clause
+    database, occurrence lists and heuristic.
+    """
 
-        for clause in clauses:
-            # clause already satisfied
-            if literal in clause:
+    def __init__(self, clauses: Iterable[Iterable[int]], num_vars: int, heuristic: str = "dlis",
+                 max_calls: int = MAX_DPLL_CALLS, stats: Optional[SolveStats] = None,
+                 budget: Optional[Budget] = None, tracer=NULL_TRACER):
+        # The setup counts towards the first solve's time limit
+        self.budget = budget if budget is not None else Budget()
+        self.budget.start()
+
+        # Always a new arena: the clauses are normalized, and add_clause
+        # appends to it, so a caller's arena is never changed
+        clauses = ClauseArena(normalized(clauses))
+        self.clauses = clauses
+        self.max_calls = max_calls
+        self.stats = stats if stats is not None else SolveStats()
+        self.tracer = tracer
+        self.num_vars = max(num_vars, clauses.max_var())
+
+        # value[literal] is 1 (true), -1 (false) or 0 (unassigned). Negative
+        # literals index from the back of the list, so no abs() is needed.
+        self.value: List[int] = [0] * (2 * self.num_vars + 1)
+        self.trail: List[int] = []
+
+        # reason[literal] is the clause that last queued literal during
+        # propagation, -1 for the units handed to propagate (decisions,
+        # assumptions and unit clauses). conflict is (literal, clause) of the
+        # last conflict: the queued literal that was already false and the
+        # clause that queued it, or (0, the clause that became empty)
+        self.reason: List[int] = [-1] * (2 * self.num_vars + 1)
+        self.conflict: Tuple[int, int] = (0, -1)
+        # Assumptions responsible for the last UNSAT of solve
+        self.core: List[int] = []
+
+        # Per clause: number of true literals and number of unassigned literals
+        self.satisfied: List[int] = [0] * len(clauses)
+        self.free: List[int] = clauses.sizes()
+        self.open_clauses = len(clauses)
+
+        # Clauses that contain each literal, built once per solve, so every
+        # assignment only touches the clauses it occurs in
+        self.occurrences: List[List[int]] = [[] for _ in range(2 * self.num_vars + 1)]
+        lits, offsets = clauses.lits, clauses.offsets
+        for i in range(len(clauses)):
+            for literal in lits[offsets[i]:offsets[i + 1]]:
+                self.occurrences[literal].append(i)
+
+        # Branching heuristic, kept up to date by assign and undo
+        self.heuristic_name = heuristic
+        self.heuristic = make_heuristic(heuristic, self)
+
+        # False once an empty clause is in the database
+        self.ok = 0 not in self.free
+
+    def add_clause(self, clause: Iterable[int]) -> None:
+        """
+        Add a clause between solves, with the trail empty.
+
+        The heuristic scores are counted over all clauses, so the heuristic
+        is rebuilt: adding clauses one by one is slow, it is meant for a few
+        clauses between solves.
+        """
+        if self.trail:
+            raise RuntimeError("add_clause is only possible with an empty trail")
+        clause = next(normalized([clause]), None)
+        if clause is None:
+            return
+        self.ensure_vars(max((abs(literal) for literal in clause), default=0))
+
+        i = self.clauses.append(clause)
+        self.satisfied.append(0)
+        self.free.append(len(clause))
+        self.open_clauses += 1
+        for literal in clause:
+            self.occurrences[literal].append(i)
+        if not clause:
+            self.ok = False
+        self.heuristic = make_heuristic(self.heuristic_name, self)
+
+    def ensure_vars(self, num_vars: int) -> None:
+        """
+        Grow the literal-indexed lists to num_vars variables, with the trail empty.
+        """
+        old = self.num_vars
+        if num_vars <= old:
+            return
+        # Negative literals index from the back, so the new literals go in the middle
+        extra = 2 * (num_vars - old)
+        self.value[old + 1:old + 1] = [0] * extra
+        self.reason[old + 1:old + 1] = [-1] * extra
+        self.occurrences[old + 1:old + 1] = [[] for _ in range(extra)]
+        self.num_vars = num_vars
+        self.heuristic = make_heuristic(self.heuristic_name, self)
+
+    def assign(self, literal: int) -> None:
+        self.value[literal] = 1
+        self.value[-literal] = -1
+        self.trail.append(literal)
+
+        satisfied, free = self.satisfied, self.free
+        newly_satisfied = 0
+        for i in self.occurrences[literal]:
+            satisfied[i] += 1
+            free[i] -= 1
+            if satisfied[i] == 1:
+                newly_satisfied += 1
+        for i in self.occurrences[-literal]:
+            free[i] -= 1
+        self.open_clauses -= newly_satisfied
+        self.heuristic.assigned(literal)
+
+    def undo(self, mark: int) -> None:
+        """
+        Unassign everything that was put on the trail after position mark.
+        """
+        satisfied, free = self.satisfied, self.free
+        while len(self.trail) > mark:
+            literal = self.trail.pop()
+            self.value[literal] = 0
+            self.value[-literal] = 0
+            for i in self.occurrences[literal]:
+                satisfied[i] -= 1
+                free[i] += 1
+                if satisfied[i] == 0:
+                    self.open_clauses += 1
+            for i in self.occurrences[-literal]:
+                free[i] += 1
+            self.heuristic.unassigned(literal)
+
+    def propagate(self, units: List[int]) -> bool:
+        """
+        Assign the unit literals and run unit propagation until nothing changes.
+        Returns False if a clause became empty.
+        """
+        value, satisfied, free, reason = self.value, self.satisfied, self.free, self.reason
+        lits, offsets = self.clauses.lits, self.clauses.offsets
+        queue = deque(units)
+        for literal in units:
+            reason[literal] = -1
+
+        while queue:
+            literal = queue.popleft()
+            # Check for conflicts
+            if value[literal] == -1:
+                self.conflict = (literal, reason[literal])
+                return False
+            if value[literal] == 1:
                 continue
-            # clause contains the negation of the literal
-            if -literal in clause:
-                reduced = [x for x in clause if x != -literal]
+            self.assign(literal)
+
+            # Only clauses containing the negation can become unit or empty
+            for i in self.occurrences[-literal]:
+                if satisfied[i]:
+                    continue
                 # Catch empty clause
-                if not reduced:
-                    return ([[]], implied)
-                # Append new unit clause to queue
-                if len(reduced) == 1:
-                    unit_clauses.append(reduced[0])
-                new_clauses.append(reduced)
+                if free[i] == 0:
+                    self.heuristic.conflict(i)
+                    self.conflict = (0, i)
+                    return False
+                # Append the last unassigned literal to the queue
+                if free[i] == 1:
+                    for other in lits[offsets[i]:offsets[i + 1]]:
+                        if value[other] == 0:
+                            reason[other] = i
+                            queue.append(other)
+                            break
+        return True
+
+    def conflict_roots(self) -> Set[int]:
+        """
+        Decisions, assumptions and unit clause literals (the literals with
+        reason -1) that the last conflict of propagate follows from, found
+        by walking the reasons back from the conflict.
+        """
+        value, reason = self.value, self.reason
+        lits, offsets = self.clauses.lits, self.clauses.offsets
+        literal, clause = self.conflict
+
+        roots: Set[int] = set()
+        stack: List[int] = []
+        if literal:
+            # literal was queued while -literal was already true
+            stack.append(literal)
+            if clause < 0:
+                roots.add(literal)
+        if clause >= 0:
+            stack.extend(lits[offsets[clause]:offsets[clause + 1]])
+
+        seen: Set[int] = set()
+        while stack:
+            v = abs(stack.pop())
+            if v in seen:
+                continue
+            seen.add(v)
+            true_literal = v if value[v] == 1 else -v
+            r = reason[true_literal]
+            if r < 0:
+                roots.add(true_literal)
             else:
-                # clause unaffected
-                new_clauses.append(clause)
-        clauses = new_clauses
-    return clauses, implied
-
+                stack.extend(lits[offsets[r]:offsets[r + 1]])
+        return roots
+
+    def initial_units(self) -> List[int]:
+        """
+        Literals of the unit clauses in the clause database.
+        """
+        lits, offsets = self.clauses.lits, self.clauses.offsets
+        return [lits[offsets[i]] for i, size in enumerate(self.clauses.sizes()) if size == 1]
+
+    def search(self, assumptions: Sequence[int] = ()) -> Optional[bool]:
+        """
+        DPLL algorithm with unit propagation and a pluggable branching heuristic.
+
+        - the assumption literals are propagated with the unit clauses at the
+          root, so they are never branched on
+        - iterative, so the search depth is not limited by Python's recursion limit
+        - every node (root or branch) counts as one DPLL call
+        - returns None if max_calls or the budget ran out before an answer;
+          the budget is started (and finished) by the caller, see solve
+        - on failure, the trail is restored to what it was before the search,
+          and with assumptions core holds the ones the refutation used
+        """
+        stats, budget = self.stats, self.budget
+        start = len(self.trail)
+
+        # Decision stack: (branching literal, trail position before it,
+        # whether this is already the second branch of the decision)
+        decisions: List[Tuple[int, int, bool]] = []
+
+        # With assumptions, every failed node gets the set of decisions and
+        # assumptions its conflicts follow from: a leaf from conflict_roots,
+        # a decision the union of both branches without the decision itself.
+        # first_failed holds the sets of the first branches of the decisions
+        # that are on their second branch
+        # (a conflict-directed backjump, see below)
+        track = bool(assumptions)
+        first_failed: List[Set[int]] = []
+
+        units = self.initial_units() + list(assumptions)
+
+        # Looked up once, so a disabled tracer costs nothing per step
+        trace = self.tracer.progress if self.tracer.enabled else None
+
+        while True:
+            if stats.dpll_calls >= self.max_calls:
+                budget.reason = "calls"
+            if budget.reason or budget.exhausted(stats.decisions, stats.conflicts, stats.propagations):
+                self.undo(start)
+                return None
+
+            stats.dpll_calls += 1
+            if trace is not None:
+                trace(stats)
+
+            # Run unit propagation on the shared clause database
+            position = len(self.trail)
+            began = time.perf_counter()
+            consistent = self.propagate(units)
+            stats.time_propagation += time.perf_counter() - began
+            stats.propagations += len(self.trail) - position - (1 if decisions else 0)
+
+            if consistent:
+                # If all clauses are satisfied, return SAT
+                if self.open_clauses == 0:
+                    return True
+
+                # use the branching heuristic to choose which literal to split on
+                began = time.perf_counter()
+                split_literal = self.heuristic.pick()
+                stats.time_branching += time.perf_counter() - began
+
+                # Try literal as True first
+                decisions.append((split_literal, len(self.trail), False))
+                stats.decisions += 1
+                stats.max_depth = max(stats.max_depth, len(decisions))
+                units = [split_literal]
+                continue
 
-def DLIS_heuristic(clauses: List[List[int]]) -> int:
-    """
-    Find the literal that appears most frequently in the clauses.
+            stats.conflicts += 1
+            failed = self.conflict_roots() if track else set()
+
+            # Conflict: go back to the last decision that still has a branch
+            # left. While tracking, a first branch that failed without using
+            # its decision fails the same way the other way round, so its
+            # second branch is skipped as well
+            while decisions and (decisions[-1][2] or track and decisions[-1][0] not in failed):
+                literal, _, second = decisions.pop()
+                if second:
+                    failed.discard(literal)
+                    if track:
+                        failed |= first_failed.pop()
+            if not decisions:
+                if track:
+                    self.core = [literal for literal in dict.fromkeys(assumptions) if literal in failed]
+                self.undo(start)
+                return False
+
+            split_literal, position, _ = decisions.pop()
+            self.undo(position)
+            if track:
+                failed.discard(split_literal)
+                first_failed.append(failed)
+
+            # Try literal as False
+            decisions.append((-split_literal, position, True))
+            stats.backtracks += 1
+            units = [-split_literal]
+
+
+    def solve(self, assumptions: Sequence[int] = ()) -> SolveResult:
+        """
+        Solve under the assumption literals, which only hold for this call.
+
+        - status is "SAT", "UNSAT" or "UNKNOWN" as for solve_cnf, the model
+          holds the assigned literals (including the assumptions)
+        - the trail is left as it was, so solve can be called again (with
+          other assumptions) on the same solver
+        - after UNSAT, core holds a subset of the assumptions that is
+          unsatisfiable together with the clauses (empty if the search
+          needed none of them)
+        - the statistics in .stats (and self.stats) count this call only
+        - once the budget is cancelled, every call returns UNKNOWN until
+          budget.reset() is called
+        """
+        self.stats = stats = SolveStats()
+        self.core = []
+        self.budget.start()
+        try:
+            if not self.ok:
+                return SolveResult("UNSAT", [], stats)
+            self.ensure_vars(max((abs(literal) for literal in assumptions), default=0))
+
+            mark = len(self.trail)
+            sat = self.search(assumptions)
+            model = list(self.trail) if sat else []
+            self.undo(mark)
+        finally:
+            self.budget.finish()
+
+        if sat is None:
+            return SolveResult("UNKNOWN", [], stats)
+        return SolveResult("SAT" if sat else "UNSAT", model, stats)
+
+
+def DPLL(clauses: Iterable[Iterable[int]], num_vars: int, assignment: Optional[List[int]] = None,
+         heuristic: str = "dlis", max_calls: int = MAX_DPLL_CALLS,
+         stats: Optional[SolveStats] = None, budget: Optional[Budget] = None,
+         tracer=NULL_TRACER) -> Tuple[Optional[bool], List[int]]:
     """
-    counts = defaultdict(int)
-
-    # Loop through all clauses and count literal occurrences
-    for clause in clauses:
-        for literal in clause:
-            counts[literal] += 1
-    
-    return max(counts, key=counts.get)
+    DPLL algorithm with unit propagation and the given branching heuristic.
 
-
-def DPLL(clauses: List[List[int]], num_vars: int, assignment: Optional[List[int]] = None
-         )-> Tuple[bool, List[int]]:
-    """
-    DPLL algorithm with unit propagation and DLIS heuristic.
+    - at most max_calls search nodes are visited, within the budget if given
+    - returns None instead of True/False if it stopped before an answer
+    - counters are added to stats if given, and reported to the tracer
     """
-    global DPLL_CALLS, MAX_DPLL_CALLS
-
-    if DPLL_CALLS >= MAX_DPLL_CALLS:
-        return False, []
-
-    DPLL_CALLS += 1
-    print("number of dpll calls: ", DPLL_CALLS)
     # Check if assignment is empty, if so, initialize it
     if assignment is None:
         assignment = []
 
-    # Run simplification (unit propagation)
-    clauses, implied_truth = simplify(clauses)
-
-    # Make copy of assignment for branching
-    full_assignment = assignment.copy()
-    assigned = set(full_assignment)
-
-    # Check for conflicts in implied literals, and add to assignment
-    for literal in implied_truth:
-        if -literal in assigned:
+    # The solver normalizes the clauses (see normalized)
+    dpll = DPLLSolver(clauses, num_vars, heuristic, max_calls, stats, budget, tracer)
+    try:
+        # If there is an empty clause, return UNSAT
+        if not dpll.ok:
             return False, []
-        if literal not in assigned:
-            assigned.add(literal)
-            full_assignment.append(literal)
 
-    # If there is an empty clause, return UNSAT
-    if any(len(c) == 0 for c in clauses):
-        return False, []
+        # Put the given assignment on the trail, so it is never branched on
+        for literal in assignment:
+            dpll.assign(literal)
 
-    # If all clauses are empty, return SAT
-    if not clauses:
-        return True, full_assignment
+        sat = dpll.search()
+    finally:
+        dpll.budget.finish()
+    if not sat:
+        return sat, []
 
-    # use DLIS heuristic to choose which literal to split on
-    split_literal = DLIS_heuristic(clauses)
+    return True, dpll.trail
 
-    # Try literal as True
-    sat, model = DPLL(clauses + [[split_literal]], num_vars, full_assignment + [split_literal])
 
-    # If satisfied, return true and model
-    if sat:
-        return True, model
-
-    # Try literal as False
-    return DPLL(clauses + [[-split_literal]], num_vars, full_assignment + [-split_literal])
-
-
-def solve_cnf(clauses: Iterable[Iterable[int]], num_vars: int) -> Tuple[str, List[int]]:
+def solve_cnf(clauses: Iterable[Iterable[int]], num_vars: int, heuristic: str = "dlis",
+              max_calls: int = MAX_DPLL_CALLS, budget: Optional[Budget] = None,
+              tracer=NULL_TRACER) -> SolveResult:
     """
     Solve the CNF sudoku by DPLL algorithm with pure literal preprocessing.
+
+    - heuristic is one of the names in heuristics.HEURISTICS
+    - status is "SAT", "UNSAT", or "UNKNOWN" when max_calls or the budget
+      ran out first (budget.reason says which)
+    - progress is reported to tracer, see tracing.py
+    - returns (status, model), with the statistics of this solve in .stats
     """
-    clause_list: List[List[int]] = [list(c) for c in clauses]
+    stats = SolveStats()
+    tracer.event("start", heuristic=heuristic, num_vars=num_vars)
+
+    # The time limit counts from here, and a budget that was cancelled
+    # before the solve stops it before any work is done
+    if budget is None:
+        budget = Budget()
+    budget.start()
+    if budget.exhausted():
+        budget.finish()
+        tracer.event("finish", status="UNKNOWN", **stats.as_dict())
+        return SolveResult("UNKNOWN", [], stats)
+
+    # Normalized before pure literal elimination too, a tautology would make
+    # both its literals look impure
+    clause_list: List[List[int]] = list(normalized(clauses))
 
     # Preprocessing: pure literal elimination
+    began = time.perf_counter()
     clause_list, pre_assign = pure_literal(clause_list)
+    stats.time_pure_literal = time.perf_counter() - began
+
+    # The search keeps its clauses in one compact array
+    clause_list = ClauseArena(clause_list)
 
-    # DPLL_CALLS variable to check how many calls were made
-    global DPLL_CALLS
-    DPLL_CALLS = 0
+    # Run DPLL, unless the budget ran out during preprocessing
+    if budget.exhausted():
+        budget.finish()
+        sat, model = None, []
+    else:
+        sat, model = DPLL(clause_list, num_vars, pre_assign, heuristic, max_calls, stats, budget, tracer)
 
-    # Run DPLL
-    sat, model = DPLL(clause_list, num_vars, pre_assign)
-    
-    if sat:
+    if sat is None:
+        solution = "UNKNOWN"
+    elif sat:
         solution = "SAT"
     else:
         solution = "UNSAT"
 
-    return solution, model
\ No newline at end of file
+    tracer.event("finish", status=solution, **stats.as_dict())
+    return SolveResult(solution, model, stats)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Budget handling of the DPLL solver: a cancel stays in effect until reset.
+Run with: python -m pytest A3
+"""
+
+import importlib.util
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# CODE/solver.py has the same module name, so load this one under its own
+spec = importlib.util.spec_from_file_location("dpll_solver", os.path.join(HERE, "solver.py"))
+dpll_solver = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dpll_solver)
+
+from budget import Budget  # noqa: E402
+
+# Satisfiable, and it takes at least one decision
+CLAUSES = [[1, 2], [-1, 3], [-2, -3], [3, 4]]
+
+
+def test_solve_cnf_cancelled_before_solve():
+    budget = Budget()
+    budget.cancel()
+    result = dpll_solver.solve_cnf(CLAUSES, 4, budget=budget)
+    assert result.status == "UNKNOWN"
+    assert budget.reason == "cancelled"
+    assert result.stats.dpll_calls == 0
+
+
+def test_solver_stays_cancelled_until_reset():
+    budget = Budget()
+    solver = dpll_solver.DPLLSolver(CLAUSES, 4, budget=budget)
+    assert solver.solve().status == "SAT"
+
+    budget.cancel()
+    for _ in range(2):
+        result = solver.solve()
+        assert result.status == "UNKNOWN"
+        assert budget.reason == "cancelled"
+        assert result.stats.dpll_calls == 0
+
+    budget.reset()
+    assert solver.solve([1, 2]).status == "UNSAT"
+    assert solver.solve().status == "SAT"
@@ -0,0 +1,82 @@
+"""
+Benchmark of the at-most-one encodings of the encoder.
+
+Usage:
+  python bench_encodings.py [--sizes 9 16 25] [--limit 10] [--time-limit 120]
+
+For N=9 the grids of ../A3/20_results/k_18 are encoded, for other sizes
+(which have no generated puzzles) an empty N x N grid. Every grid is
+encoded with each encoding in encoder.AMO_ENCODINGS and solved with the
+CDCL solver. Prints per N and encoding the variables, clauses and arena
+megabytes of one encoding (before solving), the time of the first encode
+with an empty base_encoding cache ("cold s"), and the mean time of an
+encode with the base encoding cached and of a solve.
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from budget import Budget
+from encoder import to_cnf, base_encoding, AMO_ENCODINGS
+from solver import CDCLSolver
+
+
+def grids_for(N: int, results: str, limit: int, tmp_dir: str):
+    """
+    Puzzle files to encode for size N.
+    """
+    if N == 9:
+        return sorted(glob.glob(os.path.join(results, "Sudoku grids", "Sudoku_*")))[:limit]
+    path = os.path.join(tmp_dir, f"empty_{N}.txt")
+    with open(path, "w") as f:
+        for _ in range(N):
+            f.write(" ".join("0" for _ in range(N)) + "\n")
+    return [path]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--results", default=os.path.join(os.path.dirname(__file__), "..", "A3", "20_results", "k_18"))
+    p.add_argument("--sizes", type=int, nargs="+", default=[9, 16, 25])
+    p.add_argument("--encodings", nargs="+", default=list(AMO_ENCODINGS), choices=AMO_ENCODINGS)
+    p.add_argument("--limit", type=int, default=10, help="N=9 grids")
+    p.add_argument("--time-limit", type=float, default=120.0, help="seconds per solve")
+    args = p.parse_args()
+
+    print(f"{'N':>3} {'encoding':<11}{'vars':>8}{'clauses':>10}{'MB':>8}{'cold s':>8}{'encode s':>10}"
+          f"{'solve s':>10}  status")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for N in args.sizes:
+            paths = grids_for(N, args.results, args.limit, tmp_dir)
+            for amo in args.encodings:
+                base_encoding.cache_clear()
+                began = time.perf_counter()
+                encoding = to_cnf(paths[0], amo)
+                cold = time.perf_counter() - began
+                num_vars, num_clauses, megabytes = encoding[1], len(encoding[0]), encoding[0].nbytes() / 2 ** 20
+
+                encode = solve = 0.0
+                statuses = set()
+                for path in paths:
+                    began = time.perf_counter()
+                    encoding = to_cnf(path, amo)
+                    encode += time.perf_counter() - began
+                    clauses = encoding[0]
+                    at_most_one = encoding[2] if amo == "native" else ()
+
+                    began = time.perf_counter()
+                    solver = CDCLSolver(clauses, num_vars, Budget(max_time=args.time_limit),
+                                        at_most_one=at_most_one)
+                    status, _ = solver.solve()
+                    solve += time.perf_counter() - began
+                    statuses.add(status)
+                print(f"{N:>3} {amo:<11}{num_vars:>8}{num_clauses:>10}{megabytes:>8.2f}{cold:>8.3f}"
+                      f"{encode / len(paths):>10.3f}{solve / len(paths):>10.3f}  {'/'.join(sorted(statuses))}",
+                      flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the CDCL decision polarities on the 20_results CNFs.
+
+Usage:
+  python bench_phases.py [--results ../A3/20_results] [--limit 40] [--time-limit 60]
+
+Solves the CNFs of every corpus once per phase mode (see
+solver.PHASE_MODES) and prints the conflicts per corpus and mode, with
+the total decisions and time per mode.
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from budget import Budget
+from main import parse_dimacs
+from solver import CDCLSolver, PHASE_MODES
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--results", default=os.path.join(os.path.dirname(__file__), "..", "A3", "20_results"))
+    p.add_argument("--limit", type=int, default=40, help="CNFs per corpus")
+    p.add_argument("--time-limit", type=float, default=60.0, help="seconds per solve")
+    p.add_argument("--seed", type=int, default=0, help="seed of the random phase")
+    args = p.parse_args()
+
+    corpora = sorted(d for d in os.listdir(args.results)
+                     if os.path.isdir(os.path.join(args.results, d, "CNF encoding")))
+    cnfs = {corpus: [parse_dimacs(path) for path in
+                     sorted(glob.glob(os.path.join(args.results, corpus, "CNF encoding", "DIMACS_*")))[:args.limit]]
+            for corpus in corpora}
+
+    print(f"{'phase':<9}" + "".join(f"{corpus:>8}" for corpus in corpora)
+          + f"{'conflicts':>10}{'decisions':>10}{'unknown':>8}{'seconds':>8}")
+    for phase in PHASE_MODES:
+        row, conflicts, decisions, unknown = [], 0, 0, 0
+        began = time.perf_counter()
+        for corpus in corpora:
+            corpus_conflicts = 0
+            for clauses, num_vars in cnfs[corpus]:
+                solver = CDCLSolver(clauses, num_vars, Budget(max_time=args.time_limit),
+                                    phase=phase, seed=args.seed)
+                status, _ = solver.solve()
+                unknown += status == "UNKNOWN"
+                corpus_conflicts += solver.stats.conflicts
+                decisions += solver.stats.decisions
+            row.append(corpus_conflicts)
+            conflicts += corpus_conflicts
+        seconds = time.perf_counter() - began
+        print(f"{phase:<9}" + "".join(f"{c:>8}" for c in row)
+              + f"{conflicts:>10}{decisions:>10}{unknown:>8}{seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Microbenchmark of CDCL unit propagation on the 20_results CNFs.
+
+Usage:
+  python bench_propagation.py [--results ../A3/20_results] [--limit 10] [--time-limit 60]
+
+Solves the CNFs of every corpus with the CDCL solver and prints, per
+corpus, the number of propagations, the time spent in propagate and the
+resulting propagations per second.
+"""
+
+import argparse
+import glob
+import os
+
+from budget import Budget
+from main import parse_dimacs
+from solver import CDCLSolver
+
+
+def bench_corpus(cnf_dir: str, limit: int, time_limit: float):
+    """
+    Solve up to limit CNFs of cnf_dir, returns (solved, propagations, seconds).
+    """
+    paths = sorted(glob.glob(os.path.join(cnf_dir, "DIMACS_*")))[:limit]
+    solved = propagations = 0
+    seconds = 0.0
+    for path in paths:
+        clauses, num_vars = parse_dimacs(path)
+        solver = CDCLSolver(clauses, num_vars, Budget(max_time=time_limit))
+        status, _ = solver.solve()
+        solved += status != "UNKNOWN"
+        propagations += solver.stats.propagations
+        seconds += solver.stats.time_propagation
+    return solved, propagations, seconds
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--results", default=os.path.join(os.path.dirname(__file__), "..", "A3", "20_results"))
+    p.add_argument("--limit", type=int, default=40, help="CNFs per corpus")
+    p.add_argument("--time-limit", type=float, default=60.0, help="seconds per solve")
+    args = p.parse_args()
+
+    corpora = sorted(d for d in os.listdir(args.results)
+                     if os.path.isdir(os.path.join(args.results, d, "CNF encoding")))
+
+    print(f"{'corpus':<8} {'solved':>6} {'propagations':>12} {'seconds':>8} {'props/sec':>10}")
+    total_props, total_seconds = 0, 0.0
+    for corpus in corpora:
+        solved, props, seconds = bench_corpus(os.path.join(args.results, corpus, "CNF encoding"),
+                                              args.limit, args.time_limit)
+        total_props += props
+        total_seconds += seconds
+        print(f"{corpus:<8} {solved:>6} {props:>12} {seconds:>8.3f} {props / max(seconds, 1e-9):>10.0f}")
+    print(f"{'total':<8} {'':>6} {total_props:>12} {total_seconds:>8.3f} "
+          f"{total_props / max(total_seconds, 1e-9):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
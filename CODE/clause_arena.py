@@ -0,0 +1,153 @@
+"""
+Compact clause database shared by the encoder and the SAT solvers.
+
+A list of lists costs a list object plus an int object per literal, about
+100+ bytes for a binary clause. ClauseArena keeps all literals of all
+clauses back to back in one array('i') (4 bytes per literal) with one
+offset per clause (8 bytes), so a binary clause takes 16 bytes and
+walking the clauses reads memory front to back.
+
+A3 (DPLL, encoder) and CODE (CDCL) each have an identical copy of this
+file, since the two directories are run as separate scripts. Change both
+copies together.
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Set
+
+
+class ClauseArena:
+    """
+    Clauses stored in one contiguous literal array.
+
+    - clause i is lits[offsets[i]:offsets[i + 1]], so offsets has one more
+      entry than there are clauses and the length of a clause follows from it
+    - arena[i] returns the literals of clause i as a (copied) array('i'),
+      iterating yields every clause that way, so an arena can be used where
+      a list of clauses is expected
+    - literals may be rearranged in place through lits (e.g. to move
+      watched literals to the front), clauses cannot grow or shrink
+    """
+
+    def __init__(self, clauses: Iterable[Iterable[int]] = ()):
+        self.lits = array("i")
+        self.offsets = array("q", [0])
+        self.extend(clauses)
+
+    def append(self, clause: Iterable[int]) -> int:
+        """
+        Add a clause at the end, returns its index.
+        """
+        self.lits.extend(clause)
+        self.offsets.append(len(self.lits))
+        return len(self.offsets) - 2
+
+    def extend(self, clauses: Iterable[Iterable[int]]) -> None:
+        lits, offsets = self.lits, self.offsets
+        for clause in clauses:
+            lits.extend(clause)
+            offsets.append(len(lits))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> array:
+        offsets = self.offsets
+        return self.lits[offsets[i]:offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[array]:
+        lits, offsets = self.lits, self.offsets
+        for i in range(len(offsets) - 1):
+            yield lits[offsets[i]:offsets[i + 1]]
+
+    def size(self, i: int) -> int:
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def sizes(self) -> List[int]:
+        """
+        Length of every clause, in order.
+        """
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)]
+
+    def max_var(self) -> int:
+        """
+        Highest variable occurring in any clause, 0 if there are no literals.
+        """
+        if not self.lits:
+            return 0
+        return max(max(self.lits), -min(self.lits))
+
+    @property
+    def num_literals(self) -> int:
+        return len(self.lits)
+
+    def nbytes(self) -> int:
+        """
+        Memory used by the literal and offset buffers.
+        """
+        return (self.lits.itemsize * len(self.lits)
+                + self.offsets.itemsize * len(self.offsets))
+
+    def to_lists(self) -> List[List[int]]:
+        return [clause.tolist() for clause in self]
+
+    def remove(self, doomed: Set[int]) -> Dict[int, int]:
+        """
+        Delete the clauses in doomed, keeping the others in order. Only the
+        clauses after the first deleted one move, so only that tail is
+        rewritten; returns the new index of each of them by old index.
+        """
+        if not doomed:
+            return {}
+        first = min(doomed)
+        lits, offsets = self.lits, self.offsets
+        base = offsets[first]
+        kept_lits = array("i")
+        kept_offsets = array("q")
+        new_index: Dict[int, int] = {}
+        for ci in range(first, len(offsets) - 1):
+            if ci not in doomed:
+                new_index[ci] = first + len(kept_offsets)
+                kept_lits.extend(lits[offsets[ci]:offsets[ci + 1]])
+                kept_offsets.append(base + len(kept_lits))
+        del lits[base:]
+        lits.extend(kept_lits)
+        del offsets[first + 1:]
+        offsets.extend(kept_offsets)
+        return new_index
+
+    def copy(self) -> "ClauseArena":
+        """
+        Arena with its own copy of the literal and offset buffers (one
+        memcpy each), so it can be extended or rearranged without touching
+        this one.
+        """
+        arena = ClauseArena()
+        arena.lits = array("i", self.lits)
+        arena.offsets = array("q", self.offsets)
+        return arena
+
+    def save(self, path: str) -> None:
+        """
+        Write the buffers to path in the machine's byte order, as the
+        number of clauses, the offsets and then the literals.
+        """
+        with open(path, "wb") as f:
+            array("q", [len(self)]).tofile(f)
+            self.offsets.tofile(f)
+            self.lits.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "ClauseArena":
+        """
+        Arena written by save. Raises EOFError when the file is cut short.
+        """
+        arena = cls()
+        with open(path, "rb") as f:
+            count = array("q")
+            count.fromfile(f, 1)
+            arena.offsets = array("q")
+            arena.offsets.fromfile(f, count[0] + 1)
+            arena.lits.fromfile(f, arena.offsets[-1])
+        return arena
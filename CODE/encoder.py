@@ -18,57 +18,277 @@ You must encode:
   (6) Clues: unit clauses for the given puzzle
 """
 
-from typing import Tuple, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple, Iterable, Iterator, List, Optional, Set, FrozenSet
 import math
+import os
+import tempfile
 
-def to_cnf(input_path: str) -> Tuple[Iterable[Iterable[int]], int]:
+from clause_arena import ClauseArena
+
+def to_cnf(input_path: str, amo: str = "pairwise", reduce: bool = False,
+           cache_dir: Optional[str] = None) -> Tuple[Iterable[Iterable[int]], int]:
     """
     Read puzzle from input_path and return (clauses, num_vars).
 
-    - clauses: iterable of iterables of ints (each clause), no trailing 0s
-    - num_vars: must be N^3 with N = grid size
+    - clauses: iterable of iterables of ints (each clause), no trailing 0s,
+      stored compactly in a ClauseArena
+    - num_vars: N^3 with N = grid size, plus the auxiliary variables of the
+      at-most-one encoding, which are numbered from N^3 + 1 on
+    - amo is one of AMO_ENCODINGS, how the at-most-one half of every
+      exactly-one constraint is encoded (see amo_clauses). With "native"
+      the exactly-one groups are only added as at-least-one clauses and
+      returned as at-most-one constraints too, as (clauses, num_vars,
+      at_most_one), for a solver that propagates them natively
+      (CDCLSolver's at_most_one)
+    - the clauses are a copy of base_encoding(N, amo, cache_dir) with the
+      clues appended, so only the first puzzle of a size is really encoded
+    - with reduce, the clues are propagated first and only the candidates
+      that are left get a variable, see reduced_cnf. The variable of
+      (r, c, v) is no longer var_mapping(r, c, v, N), so the list mapping
+      every variable back to its (r, c, v) is returned last:
+      (clauses, num_vars, variables), or with "native" (clauses, num_vars,
+      at_most_one, variables)
     """
+    if amo not in AMO_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding {amo!r}, expected one of {sorted(AMO_ENCODINGS)}")
 
-    # Exactly one value per cell
     f = open(input_path, 'r')
     sudoku = f.read()
-    splitlines = sudoku.splitlines()
-    N = len(splitlines)
-    clauses = list()
-
-    # Make list of all clauses
-    clauses.extend(exactly_one_v_per_cel(N))
-    # print("exactly_one_v_per_cel number of clauses:", len(exactly_one_v_per_cel(N)))
-    clauses.extend(row_constraint(N))
-    # print("row_constraint number of clauses:", len(row_constraint(N)))
-    clauses.extend(column_constraint(N))
-    # print("column_constraint number of clauses:", len(column_constraint(N)))
-    clauses.extend(box_constraint(N))
-    # print("box_constraint number of clauses:", len(box_constraint(N)))
-    clauses.extend(orthogonal_constraint(N))
-    # print("orthogonal_constraint number of clauses:", len(orthogonal_constraint(N)))
-    clauses.extend(clues_constraint(input_path))
-    # print("clues_constraint number of clauses:", len(clues_constraint(input_path)))
-    # print("Total number of clauses:", len(clauses))
-
-    # Calculate number of variables
-    num_vars = N * N * N
-    clauses = check_for_duplicates(clauses)
-    # print("Number of unique clauses after removing duplicates:", len(clauses))
     f.close()
-    return clauses, num_vars
+    grid = [[int(num) for num in line.split()] for line in sudoku.splitlines()]
+    N = len(grid)
+
+    if reduce:
+        return reduced_cnf(grid, amo)
+
+    base = base_encoding(N, amo, cache_dir)
+    clauses = base.clauses.copy()
+    # The base clauses are already unique, a clue can only repeat a unit
+    # clause of the base (N = 1)
+    for r in range(N):
+        for c in range(N):
+            if grid[r][c] != 0:
+                var = var_mapping(r, c, grid[r][c], N)
+                if var not in base.units:
+                    clauses.append([var])
+
+    if amo == "native":
+        return clauses, base.num_vars, base.groups
+    return clauses, base.num_vars
+
+
+@dataclass(frozen=True)
+class BaseEncoding:
+    """
+    The clauses every N x N puzzle shares, see base_encoding.
+
+    - clauses: cell, row, column, box and non-consecutive clauses without
+      duplicates, in to_cnf's order. Shared between puzzles, so never
+      modified: to_cnf works on a copy()
+    - num_vars: N^3 plus the auxiliary variables of the encoding
+    - units: literals of the unit clauses among them
+    - groups: the exactly-one groups with amo "native", else empty
+    """
+    clauses: ClauseArena
+    num_vars: int
+    units: FrozenSet[int]
+    groups: Tuple[Tuple[int, ...], ...] = ()
 
-def check_for_duplicates(clauses):
+
+# Part of the file names of base_encoding's cache_dir, bump it whenever the
+# base clauses change so files of an older encoder are not loaded
+ENCODING_VERSION = 1
+
+
+@lru_cache(maxsize=8)
+def base_encoding(N: int, amo: str = "pairwise", cache_dir: Optional[str] = None) -> BaseEncoding:
+    """
+    Clauses of an N x N puzzle without its clues, built once per (N, amo).
+
+    - kept in memory for the last 8 (N, amo, cache_dir) combinations
+    - with cache_dir, the clauses are also saved there as
+      base_<N>_<amo>_v<ENCODING_VERSION>.arena (see ClauseArena.save) and
+      loaded from there by later runs. A file that is cut short or whose
+      highest variable is not num_variables(N, amo) is encoded again
+    - the file is written under a temporary name first and then renamed,
+      so runs sharing cache_dir never load a half-written file
+    """
+    if amo not in AMO_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding {amo!r}, expected one of {sorted(AMO_ENCODINGS)}")
+
+    num_vars = num_variables(N, amo)
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"base_{N}_{amo}_v{ENCODING_VERSION}.arena")
+    clauses = None
+    if path is not None and os.path.exists(path):
+        try:
+            clauses = ClauseArena.load(path)
+        except (EOFError, ValueError):
+            clauses = None   # damaged file, encode again
+        if clauses is not None and clauses.max_var() != num_vars:
+            clauses = None
+
+    if clauses is None:
+        if amo == "native":
+            clauses = exactly_one_groups(N)
+            clauses.extend(orthogonal_constraint(N))
+            clauses = check_for_duplicates(clauses)
+        else:
+            clauses = ClauseArena(base_clauses(N, amo))
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+            os.close(fd)
+            try:
+                clauses.save(tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    offsets = clauses.offsets
+    units = frozenset(clauses.lits[offsets[i]] for i in range(len(clauses))
+                      if offsets[i + 1] - offsets[i] == 1)
+    groups = tuple(map(tuple, exactly_one_groups(N))) if amo == "native" else ()
+    return BaseEncoding(clauses, num_vars, units, groups)
+
+
+def num_variables(N: int, amo: str = "pairwise") -> int:
+    """
+    num_vars of the encoding of an N x N puzzle, without encoding it.
+
+    - every cell, and every row, column and box per value, has an
+      at-most-one constraint over N literals, and the auxiliary variables
+      an encoding uses only depend on the number of literals
+    """
+    if amo == "native":
+        return N * N * N
+    pool = VariablePool(0)
+    amo_clauses(list(range(1, N + 1)), amo, pool)
+    return N * N * N + 4 * N * N * pool.last
+
+
+def base_clauses(N: int, amo: str = "pairwise") -> Iterator[List[int]]:
+    """
+    Yield the clauses of exactly_one_v_per_cel, row_constraint,
+    column_constraint, box_constraint and orthogonal_constraint one at a
+    time, like check_for_duplicates would return them (literals sorted,
+    duplicates left out), without keeping them all in memory.
+
+    - clauses can only repeat when two cells of a box share a row or
+      column: the clause between them may already come from the
+      at-most-one of that row or column. For every box and value the
+      at-most-one clauses of its rows and columns are encoded again (with
+      a throwaway VariablePool) to find those, so memory stays O(N^2)
+    - a unit clause can only repeat for N = 1
+    """
+    if amo not in AMO_CLAUSE_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding {amo!r}, expected one of {sorted(AMO_CLAUSE_ENCODINGS)}")
+    B = int(math.sqrt(N))
+    pool = VariablePool(N * N * N)
+    units: Set[int] = set()
+
+    def unique(clauses):
+        for clause in clauses:
+            if len(clause) == 1:
+                if clause[0] in units:
+                    continue
+                units.add(clause[0])
+            yield sorted(clause)
+
+    cells = [[var_mapping(r, c, v, N) for v in range(1, N + 1)] for r in range(N) for c in range(N)]
+    yield from unique(cells)
+    for cell in cells:
+        yield from unique(amo_clauses(cell, amo, pool))
+
+    def row(r, v):
+        return [var_mapping(r, c, v, N) for c in range(N)]
+
+    def column(c, v):
+        return [var_mapping(r, c, v, N) for r in range(N)]
+
+    for lines in (row, column):
+        for i in range(N):
+            for v in range(1, N + 1):
+                line = lines(i, v)
+                yield from unique([line])
+                yield from unique(amo_clauses(line, amo, pool))
+
+    for b_r in range(B):
+        for b_c in range(B):
+            rows = range(b_r * B, (b_r + 1) * B)
+            columns = range(b_c * B, (b_c + 1) * B)
+            for v in range(1, N + 1):
+                box = [var_mapping(r, c, v, N) for r in rows for c in columns]
+                in_box = set(box)
+                seen = set()
+                for line in [row(r, v) for r in rows] + [column(c, v) for c in columns]:
+                    for clause in amo_clauses(line, amo, VariablePool(N * N * N)):
+                        if len(clause) == 2 and -clause[0] in in_box and -clause[1] in in_box:
+                            seen.add(tuple(sorted(clause)))
+                yield from unique([box])
+                yield from unique(clause for clause in amo_clauses(box, amo, pool)
+                                  if tuple(sorted(clause)) not in seen)
+
+    for r in range(N):
+        for c in range(N):
+            for r2, c2 in ((r, c + 1), (r + 1, c)):
+                if r2 < N and c2 < N:
+                    for v in range(1, N):
+                        yield from unique(([-var_mapping(r, c, v, N), -var_mapping(r2, c2, v + 1, N)],
+                                           [-var_mapping(r, c, v + 1, N), -var_mapping(r2, c2, v, N)]))
+
+
+def stream_cnf(input_path: str, amo: str = "pairwise") -> Tuple[Iterator[List[int]], int]:
+    """
+    (clauses, num_vars) of to_cnf, but the clauses are a generator that
+    encodes them while they are consumed (see base_clauses), for writing
+    large puzzles (N = 25, 36) to DIMACS without holding the encoding.
+
+    - the clauses and their order are the same as to_cnf's
+    - amo is one of AMO_CLAUSE_ENCODINGS, "native" has no DIMACS form
+    """
+    if amo not in AMO_CLAUSE_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding {amo!r}, expected one of {sorted(AMO_CLAUSE_ENCODINGS)}")
+
+    f = open(input_path, 'r')
+    sudoku = f.read()
+    f.close()
+    grid = [[int(num) for num in line.split()] for line in sudoku.splitlines()]
+    N = len(grid)
+
+    def clauses():
+        units = set()
+        for clause in base_clauses(N, amo):
+            if len(clause) == 1:
+                units.add(clause[0])
+            yield clause
+        for r in range(N):
+            for c in range(N):
+                if grid[r][c] != 0:
+                    var = var_mapping(r, c, grid[r][c], N)
+                    if var not in units:
+                        units.add(var)
+                        yield [var]
+
+    return clauses(), num_variables(N, amo)
+
+def check_for_duplicates(clauses) -> ClauseArena:
     """
     Check for duplicate clauses and remove to save space
+
+    - the unique clauses are returned in a ClauseArena
     """
     duplicate_clauses = set()
-    unique_clauses = []
+    unique_clauses = ClauseArena()
     for c in clauses:
         clause = tuple(sorted(c))
         if clause not in duplicate_clauses:
             duplicate_clauses.add(clause)
-            unique_clauses.append(list(clause))
+            unique_clauses.append(clause)
     return unique_clauses
 
 def var_mapping(r: int, c: int, v: int, N: int) -> int:
@@ -83,6 +303,270 @@ def var_mapping(r: int, c: int, v: int, N: int) -> int:
     return (r  * N * N) + (c  * N) + v 
 
 
+def decode(model: Iterable[int], N: int,
+           variables: Optional[List[Tuple[int, int, int]]] = None) -> List[List[int]]:
+    """
+    Grid of the values that are true in model, 0 where no value is.
+
+    - variables maps the variables of a reduced encoding back to (r, c, v),
+      without it the variables follow var_mapping
+    - auxiliary variables (above N^3, or past the end of variables) and
+      false literals are ignored
+    """
+    grid = [[0] * N for _ in range(N)]
+    for lit in model:
+        if variables is not None:
+            if 0 < lit < len(variables):
+                r, c, v = variables[lit]
+                grid[r][c] = v
+        elif 0 < lit <= N * N * N:
+            u = lit - 1
+            grid[u // (N * N)][u // N % N] = u % N + 1
+    return grid
+
+
+def propagate_clues(grid: List[List[int]]) -> List[List[Set[int]]]:
+    """
+    Candidate values of every cell once the clues are propagated.
+
+    - a cell with one candidate left (a clue, or a cell whose other values
+      were all eliminated) removes its value from the other cells of its
+      row, column and box, and the values one above and below it from its
+      orthogonal neighbours (the non-consecutive rule)
+    - repeats until no new cell is down to one candidate; a cell without
+      candidates means the clues contradict each other
+    """
+    N = len(grid)
+    B = int(math.sqrt(N))
+    candidates = [[{grid[r][c]} if grid[r][c] else set(range(1, N + 1)) for c in range(N)]
+                  for r in range(N)]
+    queue = [(r, c) for r in range(N) for c in range(N) if len(candidates[r][c]) == 1]
+    done: Set[Tuple[int, int]] = set()
+    while queue:
+        r, c = queue.pop()
+        if (r, c) in done or len(candidates[r][c]) != 1:
+            continue
+        done.add((r, c))
+        v = next(iter(candidates[r][c]))
+
+        b_r, b_c = r - r % B, c - c % B
+        peers = {(r, cc) for cc in range(N)} | {(rr, c) for rr in range(N)}
+        peers |= {(rr, cc) for rr in range(b_r, b_r + B) for cc in range(b_c, b_c + B)}
+        peers.discard((r, c))
+        eliminated = [(cell, {v}) for cell in peers]
+        for rr, cc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if 0 <= rr < N and 0 <= cc < N:
+                eliminated.append(((rr, cc), {v - 1, v + 1}))
+
+        for (rr, cc), values in eliminated:
+            cell = candidates[rr][cc]
+            if cell & values:
+                cell -= values
+                if len(cell) == 1:
+                    queue.append((rr, cc))
+    return candidates
+
+
+def reduced_cnf(grid: List[List[int]], amo: str = "pairwise"):
+    """
+    Encoding of the puzzle over the candidates left after propagate_clues.
+
+    - variables 1..K are the candidates in (r, c, v) order, variables[i]
+      is the (r, c, v) of variable i (variables[0] is None), auxiliary
+      variables of the at-most-one encoding come after K
+    - a cell with a single candidate only gets a unit clause, its row,
+      column, box and neighbours already lost that value
+    - exactly-one constraints are only added over the candidates of open
+      cells, and for a row/column/box only for values none of its cells
+      is fixed to
+    - a cell or row/column/box value without any candidate gives an empty
+      clause, so the clauses are unsatisfiable
+    - returns (clauses, num_vars, variables), with amo "native"
+      (clauses, num_vars, at_most_one, variables)
+    """
+    N = len(grid)
+    B = int(math.sqrt(N))
+    candidates = propagate_clues(grid)
+
+    variables: List[Optional[Tuple[int, int, int]]] = [None]
+    var = {}
+    for r in range(N):
+        for c in range(N):
+            for v in sorted(candidates[r][c]):
+                var[(r, c, v)] = len(variables)
+                variables.append((r, c, v))
+    pool = VariablePool(len(variables) - 1)
+
+    def fixed(r, c):
+        return len(candidates[r][c]) == 1
+
+    clauses = list()
+    groups = list()
+    for r in range(N):
+        for c in range(N):
+            cell = [var[(r, c, v)] for v in sorted(candidates[r][c])]
+            if len(cell) == 1:
+                clauses.append(cell)
+            else:
+                groups.append(cell)
+
+    units = [[(r, c) for c in range(N)] for r in range(N)]
+    units += [[(r, c) for r in range(N)] for c in range(N)]
+    units += [[(r, c) for r in range(b_r, b_r + B) for c in range(b_c, b_c + B)]
+              for b_r in range(0, N, B) for b_c in range(0, N, B)]
+    for unit in units:
+        for v in range(1, N + 1):
+            if any(fixed(r, c) and v in candidates[r][c] for r, c in unit):
+                continue
+            groups.append([var[(r, c, v)] for r, c in unit if v in candidates[r][c]])
+
+    # Non-consecutive rule between open neighbours (fixed ones were propagated)
+    for r in range(N):
+        for c in range(N):
+            for r2, c2 in ((r, c + 1), (r + 1, c)):
+                if r2 < N and c2 < N and not fixed(r, c) and not fixed(r2, c2):
+                    for v in candidates[r][c]:
+                        for w in (v - 1, v + 1):
+                            if w in candidates[r2][c2]:
+                                clauses.append([-var[(r, c, v)], -var[(r2, c2, w)]])
+
+    clauses.extend(groups)
+    if amo == "native":
+        return check_for_duplicates(clauses), pool.last, groups, variables
+    for group in groups:
+        clauses.extend(amo_clauses(group, amo, pool))
+    return check_for_duplicates(clauses), pool.last, variables
+
+
+class VariablePool:
+    """
+    Hands out new auxiliary variables, numbered after the last one in use.
+    """
+
+    def __init__(self, last: int):
+        self.last = last
+
+    def new(self) -> int:
+        self.last += 1
+        return self.last
+
+
+def pairwise_amo(literals: List[int], pool: Optional[VariablePool] = None) -> List[List[int]]:
+    """
+    At most one of literals: a binary clause for every pair, no new variables.
+    """
+    return [[-literals[i], -literals[j]]
+            for i in range(len(literals) - 1) for j in range(i + 1, len(literals))]
+
+
+def sequential_amo(literals: List[int], pool: VariablePool) -> List[List[int]]:
+    """
+    Sequential counter (Sinz), also called the ladder encoding: s_i is true
+    once one of the first i literals is, and a literal may not be true after
+    that. n - 1 new variables and 3n - 4 clauses.
+    """
+    n = len(literals)
+    if n <= 1:
+        return []
+    s = [pool.new() for _ in range(n - 1)]
+    clauses = [[-literals[0], s[0]]]
+    for i in range(1, n - 1):
+        clauses.append([-literals[i], s[i]])
+        clauses.append([-s[i - 1], s[i]])
+        clauses.append([-literals[i], -s[i - 1]])
+    clauses.append([-literals[n - 1], -s[n - 2]])
+    return clauses
+
+
+def commander_amo(literals: List[int], pool: VariablePool, group_size: int = 3) -> List[List[int]]:
+    """
+    Commander encoding (Klieber and Kwon): split the literals into groups of
+    group_size with pairwise clauses inside, a commander variable that is
+    true exactly when one of its group is, and at most one commander
+    (recursively).
+    """
+    if len(literals) <= group_size + 1:
+        return pairwise_amo(literals)
+    clauses: List[List[int]] = []
+    commanders = []
+    for i in range(0, len(literals), group_size):
+        group = literals[i:i + group_size]
+        commander = pool.new()
+        commanders.append(commander)
+        clauses.extend(pairwise_amo(group))
+        clauses.append([-commander] + group)
+        clauses.extend([-lit, commander] for lit in group)
+    clauses.extend(commander_amo(commanders, pool, group_size))
+    return clauses
+
+
+def product_amo(literals: List[int], pool: VariablePool) -> List[List[int]]:
+    """
+    2-product encoding (Chen): put the literals on a p x q grid, a true
+    literal makes its row variable and its column variable true, and at most
+    one row and one column variable may be true (recursively). About
+    2n + 4 sqrt(n) clauses.
+    """
+    n = len(literals)
+    if n <= 4:
+        return pairwise_amo(literals)
+    p = math.ceil(math.sqrt(n))
+    q = math.ceil(n / p)
+    rows = [pool.new() for _ in range(p)]
+    columns = [pool.new() for _ in range(q)]
+    clauses: List[List[int]] = []
+    for i, lit in enumerate(literals):
+        clauses.append([-lit, rows[i // q]])
+        clauses.append([-lit, columns[i % q]])
+    clauses.extend(product_amo(rows, pool))
+    clauses.extend(product_amo(columns, pool))
+    return clauses
+
+
+def bimander_amo(literals: List[int], pool: VariablePool, group_size: int = 2) -> List[List[int]]:
+    """
+    Bimander encoding (Nguyen and Mai): groups of group_size with pairwise
+    clauses inside, and a true literal forces the bits of its group number
+    in ceil(log2(groups)) new variables, so two groups cannot both have one.
+    """
+    groups = [literals[i:i + group_size] for i in range(0, len(literals), group_size)]
+    clauses = [clause for group in groups for clause in pairwise_amo(group)]
+    if len(groups) <= 1:
+        return clauses
+    bits = [pool.new() for _ in range(math.ceil(math.log2(len(groups))))]
+    for g, group in enumerate(groups):
+        for j, bit in enumerate(bits):
+            b = bit if g >> j & 1 else -bit
+            clauses.extend([-lit, b] for lit in group)
+    return clauses
+
+
+# Clause encodings of at-most-one, by name
+AMO_CLAUSE_ENCODINGS = {
+    "pairwise": pairwise_amo,
+    "sequential": sequential_amo,
+    "commander": commander_amo,
+    "product": product_amo,
+    "bimander": bimander_amo,
+}
+
+# Values of to_cnf's amo, "native" leaves the at-most-one constraints to the solver
+AMO_ENCODINGS = tuple(AMO_CLAUSE_ENCODINGS) + ("native",)
+
+
+def amo_clauses(literals: List[int], amo: str = "pairwise",
+                pool: Optional[VariablePool] = None) -> List[List[int]]:
+    """
+    Clauses for "at most one of literals" in the encoding named amo, new
+    variables are taken from pool (only pairwise needs none).
+    """
+    if amo not in AMO_CLAUSE_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding {amo!r}, expected one of {sorted(AMO_CLAUSE_ENCODINGS)}")
+    if amo != "pairwise" and pool is None:
+        raise ValueError(f"The {amo} at-most-one encoding needs a VariablePool for its new variables")
+    return AMO_CLAUSE_ENCODINGS[amo](literals, pool)
+
+
 def at_least_one(N):
     """
     Exactly one value per cell
@@ -102,63 +586,58 @@ def at_least_one(N):
     return clauses
 
 
-def at_most_one(N):
+def at_most_one(N, amo: str = "pairwise", pool: Optional[VariablePool] = None):
     clauses = list()
     for r in range(N):
         for c in range(N):
-            # Check first for only cell 0,0
-            for v1 in range(1, N):
-                for v2 in range(v1 + 1, N + 1):
-                    clause_single = [var_mapping(r,c,v1,N) * -1, var_mapping(r,c,v2,N) * -1]
-                    clauses.append(clause_single)
+            clauses.extend(amo_clauses([var_mapping(r, c, v, N) for v in range(1, N + 1)], amo, pool))
     return clauses
 
-def exactly_one_v_per_cel(N):
+def exactly_one_v_per_cel(N, amo: str = "pairwise", pool: Optional[VariablePool] = None):
     # Both at most one AND at least one are true
     clauses = at_least_one(N)
-    clauses.extend(at_most_one(N))
+    clauses.extend(at_most_one(N, amo, pool))
     return clauses
 
-def row_constraint(N: int) -> Iterable[Iterable[int]]:
+def row_constraint(N: int, amo: str = "pairwise",
+                   pool: Optional[VariablePool] = None) -> Iterable[Iterable[int]]:
     """
     Generate clauses for row constraints.
 
     - For each value v and each row r, exactly one column c has v
+    - the at-most-one part is encoded as amo (see amo_clauses)
     """
     clauses = list()
     for r in range(N):
         for v in range(1, N + 1):
-            clauses.append([var_mapping(r,c,v,N) for c in range(N)])
-            for c1 in range(N - 1):
-                for c2 in range(c1 + 1, N):
-                    clause_single = [var_mapping(r,c1,v,N) * -1,
-                                     var_mapping(r,c2,v,N) * -1]
-                    clauses.append(clause_single)
+            row = [var_mapping(r,c,v,N) for c in range(N)]
+            clauses.append(row)
+            clauses.extend(amo_clauses(row, amo, pool))
 
     return clauses
 
-def column_constraint(N: int) -> Iterable[Iterable[int]]:
+def column_constraint(N: int, amo: str = "pairwise",
+                      pool: Optional[VariablePool] = None) -> Iterable[Iterable[int]]:
     """
     Column constraint.
 
     - For each value v and each column c, exactly one row r has v
+    - the at-most-one part is encoded as amo (see amo_clauses)
     """
     clauses = []
     for c in range(N):
         for v in range(1, N+1):
-            clauses.append([var_mapping(r,c,v,N) for r in range(N)])
-            for r in range(N-1):
-                for r1 in range(r + 1, N):
-                    var1 = var_mapping(r, c, v, N)
-                    var2 = var_mapping(r1, c, v, N)
-                    clauses.append([-var1, -var2])
+            column = [var_mapping(r,c,v,N) for r in range(N)]
+            clauses.append(column)
+            clauses.extend(amo_clauses(column, amo, pool))
     return clauses
 
-def box_constraint(N):
+def box_constraint(N, amo: str = "pairwise", pool: Optional[VariablePool] = None):
     """
     Box constraint.
 
     - For each value v and each B × B box, exactly one cell in that box has v.
+    - the at-most-one part is encoded as amo (see amo_clauses)
     """
 
     B = int(math.sqrt(N))
@@ -169,25 +648,32 @@ def box_constraint(N):
             cells = [(r, c)
                 for r in range(b_r * B, (b_r + 1) * B)
                 for c in range(b_c * B, (b_c + 1) * B)]
-            #clauses.extend(inside_box(N,B,b_r,b_c))
             for v in range(1, N + 1):
-                clauses.append([var_mapping(r, c, v, N) for (r, c) in cells])
-                # Loop over exact coordinates
-                for r_1 in range(b_r * B, (b_r + 1) * B):
-                   for c_1 in range(b_c * B, (b_c + 1) * B):
-                       # For each coordinate loop for a second coordinate we can compare to
-                       for r_2 in range(b_r * B, (b_r + 1) * B):
-                           for c_2 in range(b_c * B, (b_c + 1) * B):
-                               # We will save the literal if c_2 is bigger than c_1
-                               # or r_2 is bigger than r_1
-                               var_1, var_2 = var_mapping(r_1,c_1,v,N), var_mapping(r_2,c_2,v,N)
-                               if var_1 < var_2:
-                                   clause = [var_1 * -1,
-                                             var_2 * -1]
-                                   clauses.append(clause)
+                box = [var_mapping(r, c, v, N) for (r, c) in cells]
+                clauses.append(box)
+                clauses.extend(amo_clauses(box, amo, pool))
 
     return clauses
 
+def exactly_one_groups(N: int) -> List[List[int]]:
+    """
+    Literals of every exactly-one constraint: the values of each cell, and
+    the cells of each row, column and box holding value v.
+    """
+    B = int(math.sqrt(N))
+    groups = [[var_mapping(r, c, v, N) for v in range(1, N + 1)]
+              for r in range(N) for c in range(N)]
+    for v in range(1, N + 1):
+        for i in range(N):
+            groups.append([var_mapping(i, c, v, N) for c in range(N)])
+            groups.append([var_mapping(r, i, v, N) for r in range(N)])
+        for b_r in range(B):
+            for b_c in range(B):
+                groups.append([var_mapping(r, c, v, N)
+                               for r in range(b_r * B, (b_r + 1) * B)
+                               for c in range(b_c * B, (b_c + 1) * B)])
+    return groups
+
 def orthogonal_constraint(N: int) -> Iterable[Iterable[int]]:
     """
     Non-consecutive rule
@@ -0,0 +1,160 @@
+"""
+Restart policies for the CDCL solver.
+
+The solver calls policy.conflict(lbd) after every conflict with the LBD
+(number of distinct decision levels) of the learned clause; when it
+returns True the solver backtracks to level 0, keeping its learned
+clauses and variable activities, and calls policy.restarted().
+
+Policies are registered by name in RESTART_POLICIES and built with
+make_restart_policy(name, **options), the options being the constructor
+arguments of the policy (e.g. unit for "luby", margin for "glucose").
+"""
+
+from typing import Dict, Union
+
+
+class NoRestarts:
+    """
+    Never restart.
+    """
+
+    def conflict(self, lbd: int) -> bool:
+        return False
+
+    def restarted(self) -> None:
+        pass
+
+
+class FixedRestarts(NoRestarts):
+    """
+    Restart every `interval` conflicts.
+    """
+
+    def __init__(self, interval: int = 100):
+        self.interval = interval
+        self.conflicts = 0
+
+    def limit(self) -> int:
+        return self.interval
+
+    def conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        return self.conflicts >= self.limit()
+
+    def restarted(self) -> None:
+        self.conflicts = 0
+
+
+class GeometricRestarts(FixedRestarts):
+    """
+    Restart after `first` conflicts, every next run `factor` times longer.
+    """
+
+    def __init__(self, first: int = 100, factor: float = 1.5):
+        super().__init__(first)
+        self.factor = factor
+        self.current = float(first)
+
+    def limit(self) -> int:
+        return int(self.current)
+
+    def restarted(self) -> None:
+        super().restarted()
+        self.current *= self.factor
+
+
+def luby(i: int) -> int:
+    """
+    i-th element (from 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ...
+    """
+    # Find the smallest complete block (of size 2^k - 1) containing i,
+    # then descend into the repeated halves until i is a block end
+    x = i - 1
+    size, k = 1, 0
+    while size < x + 1:
+        k += 1
+        size = 2 * size + 1
+    while size - 1 != x:
+        size = (size - 1) >> 1
+        k -= 1
+        x %= size
+    return 1 << k
+
+
+class LubyRestarts(FixedRestarts):
+    """
+    Restart after unit * luby(1), unit * luby(2), ... conflicts.
+    """
+
+    def __init__(self, unit: int = 100):
+        super().__init__(unit)
+        self.unit = unit
+        self.runs = 1
+
+    def limit(self) -> int:
+        return self.unit * luby(self.runs)
+
+    def restarted(self) -> None:
+        super().restarted()
+        self.runs += 1
+
+
+class GlucoseRestarts(NoRestarts):
+    """
+    Glucose-style dynamic restarts: restart when the recent learned clauses
+    are clearly worse (higher LBD) than the average over the whole run.
+
+    - fast and slow are exponential moving averages of the LBD
+    - restart when fast * margin > slow, at least `min_conflicts` conflicts
+      after the previous restart
+    """
+
+    def __init__(self, margin: float = 0.8, fast_alpha: float = 1 / 32,
+                 slow_alpha: float = 1 / 4096, min_conflicts: int = 50):
+        self.margin = margin
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.min_conflicts = min_conflicts
+        self.fast = self.slow = 0.0
+        self.seen = 0
+        self.conflicts = 0
+
+    def conflict(self, lbd: int) -> bool:
+        if self.seen == 0:
+            self.fast = self.slow = float(lbd)
+        else:
+            self.fast += self.fast_alpha * (lbd - self.fast)
+            self.slow += self.slow_alpha * (lbd - self.slow)
+        self.seen += 1
+        self.conflicts += 1
+        return self.conflicts >= self.min_conflicts and self.fast * self.margin > self.slow
+
+    def restarted(self) -> None:
+        self.conflicts = 0
+
+
+RESTART_POLICIES: Dict[str, type] = {
+    "none": NoRestarts,
+    "fixed": FixedRestarts,
+    "geometric": GeometricRestarts,
+    "luby": LubyRestarts,
+    "glucose": GlucoseRestarts,
+}
+
+
+def make_restart_policy(name: Union[str, NoRestarts], **options) -> NoRestarts:
+    """
+    Build the restart policy registered under name with the given options.
+
+    - a policy object instead of a name is returned as it is, so a
+      configured (or custom) policy can be passed wherever a name can
+    - an option the policy does not take raises a TypeError
+    """
+    if not isinstance(name, str):
+        if options:
+            raise ValueError("Restart options can only be given with a policy name")
+        return name
+    if name not in RESTART_POLICIES:
+        raise ValueError(f"Unknown restart policy {name!r}, expected one of {sorted(RESTART_POLICIES)}")
+    return RESTART_POLICIES[name](**options)
@@ -1,189 +1,977 @@
 # CDCL SAT Solver integrated with solve_cnf()
 # Full-power CDCL with watched literals, VSIDS, conflict analysis (1-UIP), and non-chronological backjumping.
 
-from typing import List, Tuple, Optional, Iterable, Dict
-from collections import defaultdict, deque
+from typing import List, Tuple, Optional, Iterable, Dict, Sequence, Union
+from dataclasses import dataclass, asdict
 import math
+import random
+import time
+
+from budget import Budget
+from tracing import NULL_TRACER
+from clause_arena import ClauseArena
+from restarts import make_restart_policy, NoRestarts
+
+
+@dataclass
+class SolveStats:
+    """
+    Counters of a single CDCL solve.
+
+    - peak_learned is the largest number of learned clauses (of 3+ literals)
+      kept at once
+    - learned_literals counts the literals of the learned clauses after
+      minimization, minimized_literals the ones minimization removed, and
+      minimization_ratio is the removed fraction
+    - time_propagation is the wall-clock seconds spent in propagate
+    """
+    decisions: int = 0
+    propagations: int = 0
+    conflicts: int = 0
+    learned: int = 0
+    restarts: int = 0
+    reductions: int = 0
+    deleted: int = 0
+    peak_learned: int = 0
+    learned_literals: int = 0
+    minimized_literals: int = 0
+    minimization_ratio: float = 0.0
+    time_propagation: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
 
 # ------------------ Utility: Watched Literal Data Structure ------------------
 class WatchedLiterals:
-    def __init__(self, clauses: List[List[int]]):
+    """
+    Two watched literals per clause, always the first two literals
+    (slots 0 and 1) of the clause in the arena.
+
+    - watches[lit] holds the clauses watching lit as flat pairs
+      (clause index, blocker), where the blocker is some other literal of
+      the clause: while it is true the clause is satisfied and is skipped
+      without reading it
+    - binary clauses (a or b) are not watched but kept as implications:
+      implications[-a] holds b and implications[-b] holds a
+    - negative literals index from the back of both lists
+    - clauses with fewer than two literals are not watched
+    """
+
+    def __init__(self, clauses: ClauseArena, num_vars: int):
         self.clauses = clauses
-        self.watched: Dict[int, List[int]] = defaultdict(list)  # literal -> clause indices
-        self.watch_map: List[Tuple[int, int]] = []  # for each clause: (watched_lit1, watched_lit2)
-
-        for i, clause in enumerate(self.clauses):
-            if len(clause) >= 2:
-                self.watch_map.append((clause[0], clause[1]))
-                self.watched[clause[0]].append(i)
-                self.watched[clause[1]].append(i)
-            elif len(clause) == 1:
-                lit = clause[0]
-                self.watch_map.append((lit, lit))
-                self.watched[lit].append(i)
-            else:
-                self.watch_map.append((0, 0))
+        self.watches: List[List[int]] = [[] for _ in range(2 * num_vars + 1)]
+        self.implications: List[List[int]] = [[] for _ in range(2 * num_vars + 1)]
+        for i in range(len(clauses)):
+            self.attach(i)
+
+    def attach(self, clause_idx: int) -> None:
+        lits, offsets = self.clauses.lits, self.clauses.offsets
+        start = offsets[clause_idx]
+        size = offsets[clause_idx + 1] - start
+        if size == 2:
+            first, second = lits[start], lits[start + 1]
+            self.implications[-first].append(second)
+            self.implications[-second].append(first)
+        elif size > 2:
+            first, second = lits[start], lits[start + 1]
+            self.watches[first] += (clause_idx, second)
+            self.watches[second] += (clause_idx, first)
+
+
+# ------------------ Utility: Variable Activity Heap ------------------
+class VarHeap:
+    """
+    Binary max-heap of variables ordered by activity (the VSIDS order).
+
+    - position[v] is the index of v in heap, -1 when v is not in it
+    - bumping a variable only moves it up, so increase() sifts up
+    - assigned variables are left in the heap and skipped when popped,
+      unassigned ones are put back on backtrack
+    """
+
+    def __init__(self, activity: List[float], num_vars: int):
+        self.activity = activity
+        self.heap: List[int] = list(range(1, num_vars + 1))
+        self.position: List[int] = [-1] + list(range(num_vars))
+        for i in range(len(self.heap) // 2 - 1, -1, -1):
+            self.sift_down(i)
+
+    def __contains__(self, v: int) -> bool:
+        return self.position[v] >= 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def insert(self, v: int) -> None:
+        self.position[v] = len(self.heap)
+        self.heap.append(v)
+        self.sift_up(self.position[v])
+
+    def increase(self, v: int) -> None:
+        """
+        Restore the heap order after the activity of v went up.
+        """
+        if self.position[v] >= 0:
+            self.sift_up(self.position[v])
+
+    def pop(self) -> int:
+        """
+        Remove and return the variable with the highest activity.
+        """
+        heap, position = self.heap, self.position
+        top = heap[0]
+        last = heap.pop()
+        position[top] = -1
+        if heap:
+            heap[0] = last
+            position[last] = 0
+            self.sift_down(0)
+        return top
+
+    def sift_up(self, i: int) -> None:
+        heap, position, activity = self.heap, self.position, self.activity
+        v = heap[i]
+        score = activity[v]
+        while i > 0:
+            parent = (i - 1) >> 1
+            p = heap[parent]
+            if activity[p] >= score:
+                break
+            heap[i] = p
+            position[p] = i
+            i = parent
+        heap[i] = v
+        position[v] = i
+
+    def sift_down(self, i: int) -> None:
+        heap, position, activity = self.heap, self.position, self.activity
+        size = len(heap)
+        v = heap[i]
+        score = activity[v]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and activity[heap[child + 1]] > activity[heap[child]]:
+                child += 1
+            c = heap[child]
+            if activity[c] <= score:
+                break
+            heap[i] = c
+            position[c] = i
+            i = child
+        heap[i] = v
+        position[v] = i
+
+
+# ------------------ Learned Clause Database ------------------
+class LearnedClauses:
+    """
+    Bookkeeping of the learned clauses with 3+ literals, the ones that may
+    be deleted again (learned binary and unit clauses are always kept).
+
+    - lbd[ci] is the literal block distance when clause ci was learned
+    - activity[ci] is bumped whenever ci takes part in conflict analysis,
+      with the same growing-increment decay as the variable activities
+    - clauses with lbd <= glue_lbd ("glue" clauses) are never deleted
+    - a reduction deletes the worse half of the other clauses, ordered by
+      lbd and then activity, except clauses that are the reason of an
+      assignment
+    """
+
+    def __init__(self, glue_lbd: int = 2, decay: float = 0.999):
+        self.glue_lbd = glue_lbd
+        self.decay = decay
+        self.increment = 1.0
+        self.lbd: Dict[int, int] = {}
+        self.activity: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.lbd)
+
+    def __contains__(self, ci: int) -> bool:
+        return ci in self.lbd
+
+    def add(self, ci: int, lbd: int) -> None:
+        self.lbd[ci] = lbd
+        self.activity[ci] = 0.0
+
+    def bump(self, ci: int) -> None:
+        activity = self.activity
+        activity[ci] += self.increment
+        if activity[ci] > 1e20:
+            for key in activity:
+                activity[key] *= 1e-20
+            self.increment *= 1e-20
+
+    def decay_activities(self) -> None:
+        self.increment /= self.decay
+
+    def select_deletions(self, locked) -> List[int]:
+        """
+        Clauses to delete in this reduction, locked(ci) tells if ci is a reason.
+        """
+        lbd, activity = self.lbd, self.activity
+        candidates = [ci for ci in lbd if lbd[ci] > self.glue_lbd and not locked(ci)]
+        candidates.sort(key=lambda ci: (-lbd[ci], activity[ci]))
+        return candidates[:len(candidates) // 2]
+
+    def remap(self, new_index: Dict[int, int]) -> None:
+        """
+        Renumber the clauses after the clause arena was compacted, clauses
+        missing from new_index kept their index.
+        """
+        self.lbd = {new_index.get(ci, ci): v for ci, v in self.lbd.items()}
+        self.activity = {new_index.get(ci, ci): v for ci, v in self.activity.items()}
 
-    def remap_watch(self, clause_idx: int, old_lit: int, new_lit: int):
-        self.watched[old_lit].remove(clause_idx)
-        self.watched[new_lit].append(clause_idx)
 
 # ------------------ CDCL Core ------------------
+# Decision polarities: the saved phase, always negative/positive, a coin
+# flip, or the target phase of the longest conflict-free trail
+PHASE_MODES = ("saved", "negative", "positive", "random", "target")
+
+# reason[v] of a variable implied by a binary clause, whose other (false)
+# literal is kept in reason_lit[v] instead of pointing to the clause
+BINARY = -1
+
+
 class CDCLSolver:
-    def __init__(self, clauses: List[List[int]], num_vars: int):
-        self.clauses = clauses
-        self.num_vars = num_vars
-        self.assign: List[int] = [0] * (num_vars + 1)
+    def __init__(self, clauses: Iterable[Iterable[int]], num_vars: int, budget: Optional[Budget] = None,
+                 tracer=NULL_TRACER, restarts: Union[str, NoRestarts] = "luby", reduce_interval: int = 2000,
+                 reduce_increment: int = 300, glue_lbd: int = 2, phase: str = "saved",
+                 rephase_interval: int = 1000, seed: Optional[int] = None,
+                 at_most_one: Iterable[Iterable[int]] = (),
+                 restart_options: Optional[Dict[str, float]] = None):
+        # The setup counts towards the first solve's time limit
+        self.budget = budget if budget is not None else Budget()
+        self.budget.start()
+        # Original and learned clauses, all in one compact array. A given
+        # arena is copied: learned clauses are appended to it and watched
+        # literals are swapped inside it, which the caller should not see
+        self.clauses = clauses.copy() if isinstance(clauses, ClauseArena) else ClauseArena(clauses)
+        # Native at-most-one constraints, one group of literals each (see propagate)
+        self.amo_groups = ClauseArena(dict.fromkeys(group) for group in at_most_one)
+        self.num_vars = num_vars = max(num_vars, self.clauses.max_var(), self.amo_groups.max_var())
+        self.tracer = tracer
+        self.stats = SolveStats()
+        # One of the names in restarts.RESTART_POLICIES, built with
+        # restart_options (e.g. {"unit": 50}), or a policy object
+        self.restart_policy = make_restart_policy(restarts, **(restart_options or {}))
+        # value[literal] is 1 (true), -1 (false) or 0 (unassigned). Negative
+        # literals index from the back of the list, so no abs() is needed.
+        self.value: List[int] = [0] * (2 * num_vars + 1)
         self.level: List[int] = [0] * (num_vars + 1)
         self.reason: List[Optional[int]] = [None] * (num_vars + 1)
+        self.reason_lit: List[int] = [0] * (num_vars + 1)
 
         self.decision_level = 0
         self.trail: List[int] = []
+        # trail_lim[d] is the trail position where decision level d + 1 starts
+        self.trail_lim: List[int] = []
+        # Trail position of the next literal to propagate
+        self.qhead = 0
 
-        self.wl = WatchedLiterals(self.clauses)
+        self.wl = WatchedLiterals(self.clauses, num_vars)
 
+        # amo_occurrences[lit] holds the at-most-one groups containing lit
+        self.amo_occurrences: List[List[int]] = [[] for _ in range(2 * num_vars + 1)]
+        for g, group in enumerate(self.amo_groups):
+            for lit in group:
+                self.amo_occurrences[lit].append(g)
+
+        # VSIDS: bumps grow by 1/decay after every conflict, which decays all older bumps
         self.var_score = [0.0] * (num_vars + 1)
         self.decay = 0.95
+        self.var_inc = 1.0
+        self.order = VarHeap(self.var_score, num_vars)
+
+        # Learned clause database: reduced first after reduce_interval
+        # conflicts, every next reduction reduce_increment conflicts later
+        self.learnts = LearnedClauses(glue_lbd)
+        self.reduce_increment = reduce_increment
+        self.next_reduce = reduce_interval
+        self.reduce_gap = reduce_interval
+        # Conflicts over all solve calls, which the reductions (and
+        # rephasing) are scheduled on, since stats only counts one call
+        self.conflicts = 0
+
+        # Decision polarity, one of PHASE_MODES. saved_phase[v] is the sign
+        # v had when it was last unassigned (negative at first: in a sudoku
+        # only 1 in N variables is true)
+        if phase not in PHASE_MODES:
+            raise ValueError(f"Unknown phase mode {phase!r}, expected one of {sorted(PHASE_MODES)}")
+        self.phase = phase
+        self.rng = random.Random(seed)
+        self.saved_phase: List[int] = [-1] * (num_vars + 1)
+        # "target": the assignment of the longest conflict-free trail since
+        # the last rephase, and of the longest one overall (best)
+        self.target_phase: List[int] = [0] * (num_vars + 1)
+        self.target_len = 0
+        self.best_phase: List[int] = [0] * (num_vars + 1)
+        self.best_len = 0
+        self.rephase_interval = rephase_interval
+
+        # Assumption literals responsible for the last UNSAT under assumptions
+        self.core: List[int] = []
+
+        # False once the clauses are unsatisfiable without any assumptions.
+        # Empty and unit clauses of the input are handled at level 0 here
+        self.ok = True
+        for i in range(len(self.clauses)):
+            size = self.clauses.size(i)
+            if size == 0:
+                self.ok = False
+            elif size == 1:
+                lit = self.clauses.lits[self.clauses.offsets[i]]
+                if self.value[lit] == 0:
+                    self.enqueue(lit, i)
+                elif self.value[lit] == -1:
+                    self.ok = False
 
     # ------------------ Decision Variable Choice ------------------
     def pick_branch_lit(self) -> int:
-        best = 1
-        best_score = -1
-        for v in range(1, self.num_vars + 1):
-            if self.assign[v] == 0 and self.var_score[v] > best_score:
-                best_score = self.var_score[v]
-                best = v
-        return best
+        """
+        Unassigned variable with the highest activity, 0 if all are assigned.
+        """
+        order, value = self.order, self.value
+        while len(order):
+            v = order.pop()
+            if value[v] == 0:
+                return v
+        return 0
+
+    def pick_polarity(self, v: int) -> int:
+        """
+        The literal of decision variable v to make true.
+        """
+        phase = self.phase
+        if phase == "saved":
+            sign = self.saved_phase[v]
+        elif phase == "negative":
+            sign = -1
+        elif phase == "positive":
+            sign = 1
+        elif phase == "random":
+            sign = self.rng.choice((-1, 1))
+        else:
+            sign = self.target_phase[v] or self.saved_phase[v]
+        return v if sign > 0 else -v
+
+    def update_target(self) -> None:
+        """
+        Called on a conflict, before backjumping: the levels below the
+        current one were conflict-free, remember their assignment if it is
+        the longest so far.
+        """
+        consistent = self.trail_lim[-1] if self.trail_lim else len(self.trail)
+        if consistent <= self.target_len:
+            return
+        self.target_len = consistent
+        target = self.target_phase
+        for lit in self.trail[:consistent]:
+            target[abs(lit)] = 1 if lit > 0 else -1
+        if consistent > self.best_len:
+            self.best_len = consistent
+            self.best_phase = target[:]
+
+    def rephase(self) -> None:
+        """
+        Restart the search for a long trail from the best one seen so far.
+        """
+        self.target_phase = self.best_phase[:]
+        self.saved_phase = [s or -1 for s in self.best_phase]
+        self.target_len = 0
+
+    def bump(self, v: int) -> None:
+        score = self.var_score
+        score[v] += self.var_inc
+        # Rescale everything before the activities overflow
+        if score[v] > 1e100:
+            for u in range(len(score)):
+                score[u] *= 1e-100
+            self.var_inc *= 1e-100
+        self.order.increase(v)
+
+    def decay_activities(self) -> None:
+        self.var_inc /= self.decay
 
     # ------------------ Propagation ------------------
-    def propagate(self) -> Optional[int]:
-        queue = deque(self.trail)
-        seen = set()
+    def propagate(self) -> Optional[Sequence[int]]:
+        """
+        Propagate the literals on the trail from qhead on, so every
+        assignment is propagated exactly once. Returns the literals of a
+        conflicting clause, or None.
 
-        while queue:
-            lit = queue.popleft()
-            if lit in seen:
-                continue
-            seen.add(lit)
+        An at-most-one group only acts when one of its literals becomes
+        true: the others are made false with the binary clause (-other or
+        -true literal) as reason, which is only built when conflict analysis
+        asks for it. A literal becoming false costs the groups nothing.
+        """
+        trail, value, watches = self.trail, self.value, self.wl.watches
+        implications, level, reason, reason_lit = (
+            self.wl.implications, self.level, self.reason, self.reason_lit)
+        lits, offsets = self.clauses.lits, self.clauses.offsets
+        amo_occurrences = self.amo_occurrences
+        amo_lits, amo_offsets = self.amo_groups.lits, self.amo_groups.offsets
+        stats = self.stats
+
+        while self.qhead < len(trail):
+            true_lit = trail[self.qhead]
+            false_lit = -true_lit
+            self.qhead += 1
 
-            watch_list = list(self.wl.watched.get(-lit, []))
-            for ci in watch_list:
-                clause = self.clauses[ci]
-                w1, w2 = self.wl.watch_map[ci]
-                other = w1 if w2 == -lit else w2
+            # Binary clauses (implied or false_lit) first, the reason is kept inline
+            for implied in implications[true_lit]:
+                if value[implied] == 0:
+                    stats.propagations += 1
+                    v = abs(implied)
+                    value[implied] = 1
+                    value[-implied] = -1
+                    level[v] = self.decision_level
+                    reason[v] = BINARY
+                    reason_lit[v] = false_lit
+                    trail.append(implied)
+                elif value[implied] == -1:
+                    self.qhead = len(trail)
+                    return [implied, false_lit]
 
-                if self.assign[abs(other)] == (1 if other > 0 else 2):
+            # At-most-one groups: every other literal of a group of true_lit
+            # is made false, like the binary implications above
+            for g in amo_occurrences[true_lit]:
+                for k in range(amo_offsets[g], amo_offsets[g + 1]):
+                    other = amo_lits[k]
+                    if other == true_lit or value[other] == -1:
+                        continue
+                    if value[other] == 1:
+                        self.qhead = len(trail)
+                        return [-other, false_lit]
+                    stats.propagations += 1
+                    v = abs(other)
+                    value[other] = -1
+                    value[-other] = 1
+                    level[v] = self.decision_level
+                    reason[v] = BINARY
+                    reason_lit[v] = false_lit
+                    trail.append(-other)
+
+            # Sweep the (clause, blocker) pairs watching false_lit. Pairs that
+            # stay are copied down to j, pairs whose clause moved its watch
+            # are dropped, and the list is cut to length j at the end.
+            ws = watches[false_lit]
+            end = len(ws)
+            i = j = 0
+            while i < end:
+                ci = ws[i]
+                blocker = ws[i + 1]
+                i += 2
+                if value[blocker] == 1:
+                    ws[j] = ci
+                    ws[j + 1] = blocker
+                    j += 2
                     continue
 
-                found_new = False
-                for new_lit in clause:
-                    if new_lit != other and new_lit != -lit:
-                        a = self.assign[abs(new_lit)]
-                        if a == 0 or a == (1 if new_lit > 0 else 2):
-                            self.wl.remap_watch(ci, -lit, new_lit)
-                            if w1 == -lit:
-                                self.wl.watch_map[ci] = (new_lit, w2)
-                            else:
-                                self.wl.watch_map[ci] = (w1, new_lit)
-                            found_new = True
-                            break
-
-                if found_new:
+                # Keep the false literal in slot 1
+                start = offsets[ci]
+                first = lits[start]
+                if first == false_lit:
+                    first = lits[start + 1]
+                    lits[start] = first
+                    lits[start + 1] = false_lit
+
+                if first != blocker and value[first] == 1:
+                    ws[j] = ci
+                    ws[j + 1] = first
+                    j += 2
                     continue
 
-                if self.assign[abs(other)] == 0:
-                    val = 1 if other > 0 else 2
-                    self.assign[abs(other)] = val
-                    self.level[abs(other)] = self.decision_level
-                    self.reason[abs(other)] = ci
-                    self.trail.append(other)
-                    queue.append(other)
+                # Look for a literal that is not false to watch instead
+                for k in range(start + 2, offsets[ci + 1]):
+                    lit = lits[k]
+                    if value[lit] != -1:
+                        lits[start + 1] = lit
+                        lits[k] = false_lit
+                        watches[lit] += (ci, first)
+                        break
                 else:
-                    return ci  # conflict
+                    # Clause is unit or conflicting under the watch of first
+                    ws[j] = ci
+                    ws[j + 1] = first
+                    j += 2
+                    if value[first] == 0:
+                        stats.propagations += 1
+                        self.enqueue(first, ci)
+                    else:
+                        # Keep the pairs that were not visited yet
+                        ws[j:] = ws[i:end]
+                        self.qhead = len(trail)
+                        if ci in self.learnts:
+                            self.learnts.bump(ci)
+                        return self.clauses[ci]
+            del ws[j:]
         return None
 
+    # ------------------ Assignment & Backtracking ------------------
+    def enqueue(self, lit: int, reason: Optional[int]) -> None:
+        """
+        Make lit true at the current decision level, reason is the index of
+        the clause that implied it (None for decisions).
+        """
+        v = abs(lit)
+        self.value[lit] = 1
+        self.value[-lit] = -1
+        self.level[v] = self.decision_level
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def new_decision_level(self) -> None:
+        self.trail_lim.append(len(self.trail))
+        self.decision_level += 1
+
+    def backtrack(self, level: int) -> None:
+        """
+        Undo every assignment above decision level `level`.
+        """
+        if self.decision_level <= level:
+            return
+        start = self.trail_lim[level]
+        order, saved_phase = self.order, self.saved_phase
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            saved_phase[v] = 1 if lit > 0 else -1
+            self.value[lit] = 0
+            self.value[-lit] = 0
+            self.reason[v] = None
+            if v not in order:
+                order.insert(v)
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+        self.decision_level = level
+
     # ------------------ Conflict Analysis (1-UIP) ------------------
-    def analyze(self, conflict_clause: int) -> Tuple[List[int], int]:
-        learnt = []
-        seen = set()
+    def analyze(self, conflict_clause: Sequence[int]) -> Tuple[List[int], int]:
+        """
+        Derive the first-UIP clause from a conflict, without changing the trail.
+
+        - learnt[0] is the negated UIP literal, the only one at the current level
+        - learnt[1] (if any) has the highest level of the rest, which is the
+          level to backjump to (second return value)
+        """
+        level, trail = self.level, self.trail
+        learnt = [0]
+        seen = [False] * (self.num_vars + 1)
         counter = 0
-        level = self.decision_level
+        current = self.decision_level
 
-        clause = self.clauses[conflict_clause]
+        clause = conflict_clause
+        p = 0
+        index = len(trail) - 1
 
         while True:
             for lit in clause:
                 v = abs(lit)
-                if v not in seen:
-                    seen.add(v)
-                    if self.level[v] == level:
-                        counter += 1
-                    else:
-                        learnt.append(lit)
+                if lit == p or seen[v] or level[v] == 0:
+                    continue
+                seen[v] = True
+                self.bump(v)
+                if level[v] == current:
+                    counter += 1
+                else:
+                    learnt.append(lit)
 
-            while True:
-                x = self.trail.pop()
-                vx = abs(x)
-                if vx in seen:
-                    break
+            # Next literal of the current level on the trail that is part of the conflict
+            while not seen[abs(trail[index])]:
+                index -= 1
+            p = trail[index]
+            index -= 1
+            seen[abs(p)] = False
 
             counter -= 1
             if counter == 0:
-                learnt.append(-x)
                 break
-            clause = self.clauses[self.reason[vx]]
+            reason = self.reason[abs(p)]
+            if reason in self.learnts:
+                self.learnts.bump(reason)
+            clause = self.reason_clause(abs(p))
 
-        max_level = 0
-        for lit in learnt:
+        learnt[0] = -p
+        self.decay_activities()
+        self.learnts.decay_activities()
+
+        before = len(learnt)
+        learnt = self.minimize(learnt, seen)
+        stats = self.stats
+        stats.learned_literals += len(learnt)
+        stats.minimized_literals += before - len(learnt)
+        stats.minimization_ratio = stats.minimized_literals / (stats.learned_literals + stats.minimized_literals)
+
+        backjump = 0
+        if len(learnt) > 1:
+            # Watch the highest-level literal next to the UIP literal
+            highest = max(range(1, len(learnt)), key=lambda i: level[abs(learnt[i])])
+            learnt[1], learnt[highest] = learnt[highest], learnt[1]
+            backjump = level[abs(learnt[1])]
+
+        return learnt, backjump
+
+    def analyze_final(self, p: int) -> List[int]:
+        """
+        Failed-assumption core when assumption p is false: p and the
+        assumptions (decisions) the implication of -p traces back to.
+
+        Only assumptions have been decided when p is found false, so every
+        decision reached from -p is an assumption.
+        """
+        core = [p]
+        if self.level[abs(p)] == 0:
+            return core
+        seen = [False] * (self.num_vars + 1)
+        seen[abs(p)] = True
+        level, reason, trail = self.level, self.reason, self.trail
+        for i in range(len(trail) - 1, self.trail_lim[0] - 1, -1):
+            lit = trail[i]
             v = abs(lit)
-            if self.level[v] != level:
-                max_level = max(max_level, self.level[v])
+            if not seen[v]:
+                continue
+            if reason[v] is None:
+                core.append(lit)
+            else:
+                for other in self.reason_clause(v):
+                    if level[abs(other)] > 0:
+                        seen[abs(other)] = True
+            seen[v] = False
+        return core
 
-        return learnt, max_level
+    def reason_clause(self, v: int) -> Sequence[int]:
+        """
+        Literals of the clause that implied variable v.
+        """
+        reason = self.reason[v]
+        if reason == BINARY:
+            lit = v if self.value[v] == 1 else -v
+            return (lit, self.reason_lit[v])
+        return self.clauses[reason]
 
-    # ------------------ Learn Clause & Backjump ------------------
-    def add_clause(self, clause: List[int]):
-        idx = len(self.clauses)
-        self.clauses.append(clause)
-        if len(clause) == 1:
-            lit = clause[0]
-            self.wl.watch_map.append((lit, lit))
-            self.wl.watched[lit].append(idx)
+    def minimize(self, learnt: List[int], seen: List[bool]) -> List[int]:
+        """
+        Shorten a first-UIP clause, seen marks the variables in learnt[1:].
+
+        - binary strengthening: a binary clause (learnt[0] or x) with -x in
+          the clause resolves -x away, at-most-one groups count as binary
+          clauses between each pair of their literals
+        - recursive minimization: a literal whose reason clause only has
+          literals that are in the clause, at level 0, or (recursively)
+          redundant themselves, is implied by the rest and is dropped
+        """
+        uip = learnt[0]
+        strengthened = {-x for x in self.wl.implications[-uip]}
+        amo_groups = self.amo_groups
+        for g in self.amo_occurrences[-uip]:
+            strengthened.update(amo_groups[g])
+        strengthened.discard(-uip)
+        if strengthened:
+            removed = [lit for lit in learnt[1:] if lit in strengthened]
+            if removed:
+                for lit in removed:
+                    seen[abs(lit)] = False
+                learnt = [uip] + [lit for lit in learnt[1:] if lit not in strengthened]
+
+        level, reason = self.level, self.reason
+        levels = {level[abs(lit)] for lit in learnt[1:]}
+        kept = [uip]
+        for lit in learnt[1:]:
+            if reason[abs(lit)] is None or not self.redundant(lit, levels, seen):
+                kept.append(lit)
+        return kept
+
+    def redundant(self, lit: int, levels: set, seen: List[bool]) -> bool:
+        """
+        Whether the false literal lit is implied by the literals marked seen.
+        Variables found redundant on the way stay marked, as a cache.
+        """
+        level, reason = self.level, self.reason
+        stack = [abs(lit)]
+        marked: List[int] = []
+        while stack:
+            v = stack.pop()
+            for other in self.reason_clause(v):
+                u = abs(other)
+                if u == v or seen[u] or level[u] == 0:
+                    continue
+                # Decisions and literals from other levels cannot be resolved away
+                if reason[u] is None or level[u] not in levels:
+                    for w in marked:
+                        seen[w] = False
+                    return False
+                seen[u] = True
+                marked.append(u)
+                stack.append(u)
+        return True
+
+    def lbd(self, clause: Sequence[int]) -> int:
+        """
+        Literal block distance: the number of distinct decision levels in clause.
+        """
+        level = self.level
+        return len({level[abs(lit)] for lit in clause})
+
+    # ------------------ Incremental Clauses & Variables ------------------
+    def add_clause(self, clause: Iterable[int]) -> bool:
+        """
+        Add a clause to the formula between solves, returns False once the
+        formula is unsatisfiable.
+
+        - literals false at level 0 are dropped, clauses true at level 0
+          (or tautologies) are not added at all
+        - a unit clause is assigned and propagated at level 0 right away
+        - variables above num_vars are added
+        """
+        self.backtrack(0)
+        if not self.ok:
+            return False
+        clause = list(dict.fromkeys(clause))
+        self.ensure_vars(max((abs(lit) for lit in clause), default=0))
+        value = self.value
+        if any(value[lit] == 1 or -lit in clause for lit in clause):
+            return True
+        clause = [lit for lit in clause if value[lit] == 0]
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], self.clauses.append(clause))
+            self.ok = self.propagate() is None
         else:
-            self.wl.watch_map.append((clause[0], clause[1]))
-            self.wl.watched[clause[0]].append(idx)
-            self.wl.watched[clause[1]].append(idx)
+            self.attach_clause(clause)
+        return self.ok
+
+    def ensure_vars(self, num_vars: int) -> None:
+        """
+        Grow the per-variable and per-literal lists to num_vars variables.
+        """
+        old = self.num_vars
+        if num_vars <= old:
+            return
+        extra = num_vars - old
+
+        # Negative literals index from the back, so the new literals go in
+        # the middle of the literal-indexed lists
+        self.value = self.value[:old + 1] + [0] * (2 * extra) + self.value[old + 1:]
+        for lists in (self.wl.watches, self.wl.implications, self.amo_occurrences):
+            lists[old + 1:old + 1] = [[] for _ in range(2 * extra)]
+
+        self.level += [0] * extra
+        self.reason += [None] * extra
+        self.reason_lit += [0] * extra
+        self.var_score += [0.0] * extra
+        self.saved_phase += [-1] * extra
+        self.target_phase += [0] * extra
+        self.best_phase += [0] * extra
+        self.order.position += [-1] * extra
+        self.num_vars = num_vars
+        for v in range(old + 1, num_vars + 1):
+            self.order.insert(v)
+
+    # ------------------ Learn Clause & Backjump ------------------
+    def attach_clause(self, clause: List[int]) -> int:
+        """
+        Add a clause and watch its first two literals, returns its index.
+        """
+        idx = self.clauses.append(clause)
+        self.wl.attach(idx)
+        return idx
+
+    def locked(self, ci: int) -> bool:
+        """
+        Whether clause ci is the reason of a current assignment (which is
+        always the literal in slot 0).
+        """
+        first = self.clauses.lits[self.clauses.offsets[ci]]
+        return self.value[first] == 1 and self.reason[abs(first)] == ci
+
+    def reduce_db(self) -> None:
+        """
+        Delete the worse half of the deletable learned clauses.
+
+        The arena is only compacted from the first deleted clause on (see
+        ClauseArena.remove), which is where the learned clauses are, so
+        only the watches and reasons of that tail are renumbered. The
+        problem clauses before it and the binary implications stay as
+        they are.
+        """
+        doomed = set(self.learnts.select_deletions(self.locked))
+        self.stats.reductions += 1
+        self.stats.deleted += len(doomed)
+        if not doomed:
+            return
+
+        clauses, reason, watches = self.clauses, self.reason, self.wl.watches
+        first = min(doomed)
+        # A long clause is watched by its literals in slots 0 and 1, these
+        # lists hold every pair of the tail
+        lits, offsets = clauses.lits, clauses.offsets
+        watched = set()
+        for ci in range(first, len(clauses)):
+            start = offsets[ci]
+            if offsets[ci + 1] - start > 2:
+                watched.add(lits[start])
+                watched.add(lits[start + 1])
+
+        new_index = clauses.remove(doomed)
+        for ci in doomed:
+            del self.learnts.lbd[ci]
+            del self.learnts.activity[ci]
+        self.learnts.remap(new_index)
+
+        for lit in watched:
+            ws = watches[lit]
+            kept = []
+            for k in range(0, len(ws), 2):
+                ci = ws[k]
+                if ci < first:
+                    kept += (ci, ws[k + 1])
+                elif ci in new_index:
+                    kept += (new_index[ci], ws[k + 1])
+            ws[:] = kept
+
+        # Long-clause reasons point into the arena, BINARY and None do not.
+        # Reasons of assigned variables are never deleted (see locked)
+        for lit in self.trail:
+            v = abs(lit)
+            r = reason[v]
+            if r is not None and r >= first:
+                reason[v] = new_index[r]
 
     # ------------------ Solve ------------------
-    def solve(self) -> Tuple[str, List[int]]:
+    def solve(self, assumptions: Sequence[int] = ()) -> Tuple[str, List[int]]:
+        """
+        Returns ("SAT", model), ("UNSAT", []) or ("UNKNOWN", []) when the
+        budget ran out first (budget.reason says which limit).
+
+        - the assumption literals only hold during this call, they are
+          decided first, each on its own decision level
+        - learned clauses, activities and saved phases are kept for the next
+          call, so a series of solves over the same clauses (e.g. one sudoku
+          encoding with different clues as assumptions) learns only once
+        - after UNSAT, core holds the assumptions that are (together)
+          unsatisfiable with the clauses, found by final conflict analysis;
+          it is empty when the clauses are unsatisfiable by themselves
+        - stats counts this call only
+        - once the budget is cancelled, every call returns UNKNOWN until
+          budget.reset() is called
+        """
+        stats = self.stats = SolveStats()
+        # The learned clauses of earlier calls are still kept
+        stats.peak_learned = len(self.learnts)
+        self.core = []
+        self.budget.start()
+        try:
+            return self.search(assumptions)
+        finally:
+            self.budget.finish()
+
+    def search(self, assumptions: Sequence[int]) -> Tuple[str, List[int]]:
+        """
+        The CDCL loop of solve, which starts and finishes the budget around it
+        (the budget check at the top of the loop comes before any work).
+        """
+        stats, budget = self.stats, self.budget
+        trace = self.tracer.progress if self.tracer.enabled else None
+
+        self.backtrack(0)
+        if not self.ok:
+            return "UNSAT", []
+        self.ensure_vars(max((abs(lit) for lit in assumptions), default=0))
+        value = self.value
+
         while True:
+            if budget.exhausted(stats.decisions, stats.conflicts, stats.propagations):
+                self.backtrack(0)
+                return "UNKNOWN", []
+            if trace is not None:
+                trace(stats)
+            began = time.perf_counter()
             conflict = self.propagate()
+            stats.time_propagation += time.perf_counter() - began
             if conflict is not None:
+                stats.conflicts += 1
+                self.conflicts += 1
                 if self.decision_level == 0:
+                    self.ok = False
                     return "UNSAT", []
+                if self.phase == "target":
+                    self.update_target()
+                    if self.conflicts % self.rephase_interval == 0:
+                        self.rephase()
                 learnt, bj = self.analyze(conflict)
-                self.add_clause(learnt)
-                self.decision_level = bj
+                lbd = self.lbd(learnt)
+                # Backjump, then the learned clause is unit: assert its UIP literal
+                self.backtrack(bj)
+                stats.learned += 1
+                ci = self.attach_clause(learnt)
+                self.enqueue(learnt[0], ci)
+                if len(learnt) > 2:
+                    self.learnts.add(ci, lbd)
+                    stats.peak_learned = max(stats.peak_learned, len(self.learnts))
+
+                if self.conflicts >= self.next_reduce:
+                    self.reduce_db()
+                    self.reduce_gap += self.reduce_increment
+                    self.next_reduce = self.conflicts + self.reduce_gap
+
+                # Restart keeps the learned clauses and activities
+                if self.restart_policy.conflict(lbd):
+                    self.backtrack(0)
+                    self.restart_policy.restarted()
+                    stats.restarts += 1
             else:
-                lit = self.pick_branch_lit()
+                # Decision level d + 1 assumes assumptions[d], an assumption
+                # that is already true gets an empty level
+                lit = 0
+                while self.decision_level < len(assumptions):
+                    p = assumptions[self.decision_level]
+                    if value[p] == 1:
+                        self.new_decision_level()
+                    elif value[p] == -1:
+                        self.core = self.analyze_final(p)
+                        self.backtrack(0)
+                        return "UNSAT", []
+                    else:
+                        lit = p
+                        break
                 if lit == 0:
-                    break
-                self.decision_level += 1
-                self.assign[lit] = 1
-                self.level[lit] = self.decision_level
-                self.reason[lit] = None
-                self.trail.append(lit)
-
-        model = []
-        for i in range(1, self.num_vars + 1):
-            if self.assign[i] == 1:
-                model.append(i)
-            elif self.assign[i] == 2:
-                model.append(-i)
+                    var = self.pick_branch_lit()
+                    if var == 0:
+                        break
+                    stats.decisions += 1
+                    lit = self.pick_polarity(var)
+                self.new_decision_level()
+                self.enqueue(lit, None)
+
+        model = [v if value[v] == 1 else -v for v in range(1, self.num_vars + 1)]
+        self.backtrack(0)
         return "SAT", model
 
 # ------------------ solve_cnf interface ------------------
-def solve_cnf(clauses: Iterable[Iterable[int]], num_vars: int) -> Tuple[str, List[int]]:
-    clause_list = [list(c) for c in clauses]
-    solver = CDCLSolver(clause_list, num_vars)
-    return solver.solve()
\ No newline at end of file
+def solve_cnf(clauses: Iterable[Iterable[int]], num_vars: int,
+              budget: Optional[Budget] = None, tracer=NULL_TRACER,
+              restarts: Union[str, NoRestarts] = "luby", **options) -> Tuple[str, List[int]]:
+    """
+    Solve the CNF with the CDCL solver, options are passed on to CDCLSolver
+    (restart_options configures the restart policy).
+    """
+    tracer.event("start", num_vars=num_vars)
+    # The time limit counts from here, and a budget that was cancelled
+    # before the solve stops it before any work is done
+    if budget is None:
+        budget = Budget()
+    budget.start()
+    if budget.exhausted():
+        budget.finish()
+        tracer.event("finish", status="UNKNOWN", **SolveStats().as_dict())
+        return "UNKNOWN", []
+
+    solver = CDCLSolver(clauses, num_vars, budget, tracer, restarts, **options)
+    status, model = solver.solve()
+    tracer.event("finish", status=status, **solver.stats.as_dict())
+    return status, model
@@ -0,0 +1,55 @@
+"""
+Budget handling of the CDCL solver: a cancel stays in effect until reset.
+Run with: python -m pytest CODE
+"""
+
+import importlib.util
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# A3/solver.py has the same module name, so load this one under its own
+spec = importlib.util.spec_from_file_location("cdcl_solver", os.path.join(HERE, "solver.py"))
+cdcl_solver = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cdcl_solver)
+
+from budget import Budget  # noqa: E402
+
+# Satisfiable, and it takes at least one decision
+CLAUSES = [[1, 2], [-1, 3], [-2, -3], [3, 4]]
+
+
+def test_solve_cnf_cancelled_before_solve():
+    budget = Budget()
+    budget.cancel()
+    assert cdcl_solver.solve_cnf(CLAUSES, 4, budget=budget) == ("UNKNOWN", [])
+    assert budget.reason == "cancelled"
+
+
+def test_solver_cancelled_before_solve():
+    budget = Budget()
+    solver = cdcl_solver.CDCLSolver(CLAUSES, 4, budget=budget)
+    budget.cancel()
+    assert solver.solve() == ("UNKNOWN", [])
+    assert budget.reason == "cancelled"
+    assert solver.stats.conflicts == 0
+    assert solver.stats.decisions == 0
+
+
+def test_persistent_solver_stays_cancelled_until_reset():
+    budget = Budget()
+    solver = cdcl_solver.CDCLSolver(CLAUSES, 4, budget=budget)
+    assert solver.solve()[0] == "SAT"
+
+    # Cancelled between two incremental calls
+    budget.cancel()
+    for _ in range(2):
+        assert solver.solve([1, 2]) == ("UNKNOWN", [])
+        assert budget.reason == "cancelled"
+        assert solver.stats.conflicts == 0
+
+    budget.reset()
+    assert solver.solve([1, 2])[0] == "UNSAT"
+    assert solver.solve()[0] == "SAT"
@@ -0,0 +1,140 @@
+"""
+Tracing and progress reporting for the SAT solvers.
+
+The solver calls tracer.progress(stats) once per search step and
+tracer.event(name, **data) at the start and end of a solve. A Tracer
+samples the progress calls (every so many decisions and/or seconds) and
+hands the resulting records, plain dicts, to its sinks:
+
+- StderrSink: one human-readable progress line per record
+- JsonlSink: one JSON object per line in a trace file
+- RingBufferSink: the last `capacity` records, kept in memory
+
+The default NULL_TRACER is disabled, and the solver does not call it at
+all in its search loop, so tracing costs nothing unless it is switched on.
+A3/tracing.py (for the DPLL solver) and CODE/tracing.py (for the CDCL
+solver) are identical copies, change both together.
+"""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+import json
+import sys
+import time
+
+Record = Dict[str, Any]
+Sink = Callable[[Record], None]
+
+
+class NullTracer:
+    """
+    Tracer that records nothing, used when tracing is off.
+    """
+    enabled = False
+
+    def progress(self, stats) -> None:
+        pass
+
+    def event(self, name: str, **data) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer(NullTracer):
+    """
+    Sampled tracer writing to one or more sinks.
+
+    - every: emit a progress record each time this many more decisions were made
+    - interval: emit a progress record each time this many seconds have passed
+    - with neither set, every progress call is recorded
+    """
+    enabled = True
+
+    def __init__(self, sinks: Iterable[Sink], every: Optional[int] = None,
+                 interval: Optional[float] = None):
+        self.sinks: List[Sink] = list(sinks)
+        self.every = every
+        self.interval = interval
+        self._started = time.perf_counter()
+        self._next_decisions = 0
+        self._next_time = 0.0
+
+    def emit(self, record: Record) -> None:
+        for sink in self.sinks:
+            sink(record)
+
+    def event(self, name: str, **data) -> None:
+        if name == "start":
+            self._started = time.perf_counter()
+            self._next_decisions = 0
+            self._next_time = 0.0
+        self.emit({"event": name, "t": round(time.perf_counter() - self._started, 6), **data})
+
+    def progress(self, stats) -> None:
+        elapsed = time.perf_counter() - self._started
+        due = self.every is None and self.interval is None
+        if self.every is not None and stats.decisions >= self._next_decisions:
+            due = True
+        if self.interval is not None and elapsed >= self._next_time:
+            due = True
+        if not due:
+            return
+
+        if self.every is not None:
+            self._next_decisions = stats.decisions + self.every
+        if self.interval is not None:
+            self._next_time = elapsed + self.interval
+        self.emit({"event": "progress", "t": round(elapsed, 6), **stats.as_dict()})
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            close = getattr(sink, "close", None)
+            if close is not None:
+                close()
+
+
+# ------------------ Sinks ------------------
+class StderrSink:
+    """
+    Writes each record as a single line of key=value pairs to stderr.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stderr
+
+    def __call__(self, record: Record) -> None:
+        fields = " ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in record.items() if key != "event")
+        print(f"[{record['event']}] {fields}", file=self.stream, flush=True)
+
+
+class JsonlSink:
+    """
+    Appends each record as one JSON line to the file at path.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+
+    def __call__(self, record: Record) -> None:
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class RingBufferSink:
+    """
+    Keeps the last `capacity` records in memory, in .records.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.records: Deque[Record] = deque(maxlen=capacity)
+
+    def __call__(self, record: Record) -> None:
+        self.records.append(record)